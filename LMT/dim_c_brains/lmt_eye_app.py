@@ -3,6 +3,7 @@
 """
 
 import sys
+import logging
 from pathlib import Path
 
 ################
@@ -962,6 +963,7 @@ if __name__ == "__main__":
         pass
 
     sys.excepthook = exception_hook
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
 
     app = QApplication(sys.argv)
     app.setQuitOnLastWindowClosed(True)
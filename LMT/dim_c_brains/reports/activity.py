@@ -10,6 +10,8 @@ import plotly.express as px
 from dim_c_brains.scripts.reports_manager import HTMLReportManager
 from dim_c_brains.scripts.plotting_functions import (
     draw_nights,
+    get_nights,
+    get_hours,
     line_with_shade,
 )
 from LMT.dim_c_brains.reports.overview import get_activity_card
@@ -59,6 +61,8 @@ def generic_reports(
         "night_begin": settings.night_begin,
         "night_duration": settings.night_duration,
     }
+    # night periods, shared by all the figures over time
+    nights_parameters["nights"] = get_nights(**nights_parameters)
 
     plot_param = settings.get_plot_parameters(df)
     xlsx_param = settings.get_xlsx_parameters(df)
@@ -291,15 +295,14 @@ def generic_reports(
     #######################################
     #   Movement and stop duration per hour of the day   #
     #######################################
-    df_plot = df.copy()
-    df_plot["HOUR"] = df_plot[x_axis].apply(lambda x: x.hour)
+    hour = get_hours(df[x_axis])
     df_plot = (
-        df_plot.groupby([comparator, "HOUR"], observed=True)[
+        df.groupby([comparator, hour], observed=True)[
             ["MOVE_DURATION", "STOP_DURATION"]
         ]
         .sum()
         .reset_index()
-        .sort_values(by="HOUR")
+        .sort_values(by="HOUR", kind="stable")
     )
     df_plot["HOUR"] = df_plot["HOUR"].astype(str) + "h"
 
@@ -9,6 +9,9 @@ from dim_c_brains.scripts.reports_manager import HTMLReportManager
 from dim_c_brains.scripts.plotting_functions import (
     floor_power10,
     draw_nights,
+    get_nights,
+    get_hours,
+    grouped_figure,
 )
 from LMT.dim_c_brains.reports.overview import get_event_card
 from dim_c_brains.scripts.settings import AnalysisSettings, ComparisonSettings
@@ -41,20 +44,22 @@ def generic_reports(
     comparator = settings.report_color
 
     NB_ANIMALS = df["RFID"].nunique()
-    EXP_DURATION = (
-        df["END_TIME"].max() - df["START_TIME"].min()
-    ).total_seconds()
+    START_TIME = df["START_TIME"].min()
+    END_TIME = df["END_TIME"].max()
+    EXP_DURATION = (END_TIME - START_TIME).total_seconds()
     NB_DAYS = EXP_DURATION / 3600 / 24
 
     # if settings.bin_rounding:
     #     df = df[df["START_FRAME"] != df["START_FRAME"].iloc[0]]
 
     nights_parameters = {
-        "start_time": df["START_TIME"].min(),
-        "end_time": df["END_TIME"].max(),
+        "start_time": START_TIME,
+        "end_time": END_TIME,
         "night_begin": settings.night_begin,
         "night_duration": settings.night_duration,
     }
+    # night periods, shared by all the figures over time
+    nights_parameters["nights"] = get_nights(**nights_parameters)
 
     plot_param = settings.get_plot_parameters(df)
     xlsl_param = settings.get_xlsx_parameters(df)
@@ -63,8 +68,10 @@ def generic_reports(
 
     if comparator == "RFID":
         plot = px.line
+        plot_kind = "line"
     else:
         plot = px.scatter
+        plot_kind = "scatter"
 
     # ================ Titles ================
 
@@ -96,8 +103,17 @@ def generic_reports(
         Calculated time bin depends on the experiment analysis. As an 
         information, we show here the analysis binning chose for each animal:
         """
-        for rfid in sorted(df["RFID"].unique()):
-            time_window = df[df["RFID"] == rfid]["START_TIME"].diff().max()
+        # largest interval between two bins of each animal
+        rfids = df["RFID"]
+        time_windows = (
+            df["START_TIME"]
+            .groupby(rfids, observed=True)
+            .diff()
+            .groupby(rfids, observed=True)
+            .max()
+        )
+        for rfid in sorted(rfids.unique()):
+            time_window = time_windows[rfid]
             time_window_min = round(time_window.total_seconds() / 60)
             msg += f"<br> - {rfid}: {time_window_min} min"
         report_manager.add_card(
@@ -127,7 +143,7 @@ def generic_reports(
     figs = []
 
     figs.append(
-        px.bar(
+        grouped_figure(
             df_plot,
             x=comparator,
             y="EVENT_COUNT",
@@ -140,7 +156,7 @@ def generic_reports(
     )
 
     figs.append(
-        px.bar(
+        grouped_figure(
             df_plot,
             x=comparator,
             y="DURATION",
@@ -154,7 +170,7 @@ def generic_reports(
     )
 
     figs.append(
-        px.bar(
+        grouped_figure(
             df_plot,
             x=comparator,
             y="EVENT_COUNT_PER_DAY",
@@ -168,7 +184,7 @@ def generic_reports(
     )
 
     figs.append(
-        px.bar(
+        grouped_figure(
             df_plot,
             x=comparator,
             y="DURATION_PER_DAY",
@@ -210,23 +226,22 @@ def generic_reports(
 
     # ================ Event per hour of the day ================
 
-    df_plot = df.copy()
-    df_plot["DAYS"] = df_plot[x_axis].apply(lambda x: x.day)
-    df_plot["HOUR"] = df_plot[x_axis].apply(lambda x: x.hour)
-
-    nb_days_per_hour = []
-    for h in range(24):
-        nb_days_per_hour.append(
-            df_plot[df_plot["HOUR"] == h]["DAYS"].nunique()
-        )
+    hour = get_hours(df[x_axis])
+    nb_days_per_hour = (
+        df[x_axis]
+        .dt.day.groupby(hour)
+        .nunique()
+        .reindex(range(24), fill_value=0)
+        .tolist()
+    )
 
     df_plot = (
-        df_plot.groupby([comparator, "HOUR"], observed=True)[
+        df.groupby([comparator, hour], observed=True)[
             ["EVENT_COUNT", "DURATION"]
         ]
         .sum()
         .reset_index()
-        .sort_values(by="HOUR")
+        .sort_values(by="HOUR", kind="stable")
     )
 
     for color in plot_param["category_orders"][comparator]:
@@ -304,10 +319,11 @@ def generic_reports(
 
     # ================ Event counts ================
 
-    fig = plot(
+    fig = grouped_figure(
         df,
         x=x_axis,
         y="EVENT_COUNT",
+        kind=plot_kind,
         title=f"EVENT_COUNT per {comparator} over {x_axis}",
         **plot_param,
     )
@@ -332,10 +348,11 @@ def generic_reports(
 
     # ================ Event duration ================
 
-    fig = plot(
+    fig = grouped_figure(
         df,
         x=x_axis,
         y="DURATION",
+        kind=plot_kind,
         title=f"DURATION per {comparator} over {x_axis}",
         labels={"DURATION": "DURATION (min)"},
         **plot_param,
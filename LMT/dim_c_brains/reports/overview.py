@@ -2,8 +2,10 @@
 @author: xmousset
 """
 
+from html import escape
 from typing import List
 
+import numpy as np
 import pandas as pd
 
 from dim_c_brains.scripts.reports_manager import HTMLReportManager
@@ -36,9 +38,9 @@ def generic_reports(
     #######################################
 
     NB_ANIMALS = df_animals["RFID"].nunique()
-    EXP_DURATION = (
-        df_activity["END_TIME"].max() - df_activity["START_TIME"].min()
-    ).total_seconds()
+    START_TIME = df_activity["START_TIME"].min()
+    END_TIME = df_activity["END_TIME"].max()
+    EXP_DURATION = (END_TIME - START_TIME).total_seconds()
     NB_DAYS = EXP_DURATION / 3600 / 24
 
     if isinstance(settings, AnalysisSettings):
@@ -90,7 +92,7 @@ def generic_reports(
                 font-weight: bold;
             }}
         </style>
-        <center>{df_animals.to_html(index=False, border=1)}</center>
+        <center>{get_table_html(df_animals)}</center>
         """,
     )
 
@@ -118,10 +120,10 @@ def generic_reports(
                 {settings.time_window / settings.fps / 60} minutes
                 </strong></p>
                 <p style="margin: 0.5em 0;">
-                {df_activity["START_TIME"].min()} - start
+                {START_TIME} - start
                 </p>
                 <p style="margin: 0.5em 0;">
-                {df_activity["END_TIME"].max()} - end
+                {END_TIME} - end
                 </p>
             """
     card += """
@@ -162,11 +164,10 @@ def generic_reports(
     #######################################
     if df_events is not None:
 
-        overview_event_list = df_events["EVENT"].unique().tolist()
-
+        # all the events, in order of appearance
         card = get_event_card(
             df_events,
-            overview_event_list,
+            None,
             NB_ANIMALS,
             NB_DAYS,
         )
@@ -239,92 +240,138 @@ def generic_reports(
     report_manager.add_table_headers(name="complete table", df=df_animals)
 
 
+def get_table_html(df: pd.DataFrame) -> str:
+    """Same table as `df.to_html(index=False, border=1)` for a simple table
+    (no MultiIndex, no formatting), without pandas' formatting machinery."""
+
+    def cell(value) -> str:
+        if value is not None and pd.isna(value):
+            return "<td>NaN</td>"
+        return f"<td>{escape(str(value))}</td>"
+
+    def column_cells(column: pd.Series) -> list[str]:
+        if column.dtype.kind == "f" and len(column) > 0:
+            # floats are formatted by column by pandas, as in to_html
+            # (display.precision, common number of decimals)
+            values = column.to_string(index=False, header=False).split("\n")
+            return [f"<td>{escape(value.strip())}</td>" for value in values]
+        return [cell(value) for value in column]
+
+    headers = "".join(f"<th>{escape(str(col))}</th>" for col in df.columns)
+    columns = [column_cells(df.iloc[:, i]) for i in range(df.shape[1])]
+    rows = "".join("<tr>" + "".join(row) + "</tr>" for row in zip(*columns))
+    return (
+        '<table border="1" class="dataframe">'
+        f'<thead><tr style="text-align: right;">{headers}</tr></thead>'
+        f"<tbody>{rows}</tbody>"
+        "</table>"
+    )
+
+
 def get_activity_card(
     df: pd.DataFrame,
     NB_ANIMALS: int,
     NB_DAYS: float,
     settings: AnalysisSettings,
 ):
-    card = """<div style="flex: 0 0 320px; min-width: 220px;
+    parts = ["""<div style="flex: 0 0 320px; min-width: 220px;
     max-width: 400px;"> <div style="margin:0; padding:0;">
-    """
+    """]
     filters = []
     if settings.filter_flickering:
         filters.append("Flickering")
     if settings.filter_stop:
         filters.append("Stop")
     filters_str = ", ".join(filters) if filters else "no filters applied"
-    card += f"""
+    parts.append(f"""
     <p style='margin: 0.5em 0;'><strong>Applied filters</strong>: 
     {filters_str}
     </p>
-    """
+    """)
 
-    mean_distance = round(df["DISTANCE"].sum() / NB_ANIMALS / NB_DAYS / 100)
-    card += f"""
+    # daily means per animal of all the summed columns at once
+    daily_means = df[
+        ["DISTANCE", "MOVE_DURATION", "STOP_DURATION", "UNDETECTED_DURATION"]
+    ].sum().to_numpy() / (NB_ANIMALS * NB_DAYS)
+    distance, move_duration, stop_duration, undetected_duration = daily_means
+
+    mean_distance = round(distance / 100)
+    parts.append(f"""
     <p style='margin: 0.5em 0;'><strong>Distance</strong>: 
     {mean_distance} <i>m</i> each day</p>
-    """
+    """)
 
     mean_speed = round(df["SPEED_MEAN"].mean())
-    card += f"""
+    parts.append(f"""
     <p style='margin: 0.5em 0;'><strong>Speed</strong>: 
     {mean_speed} <i>cm/s</i></p>
-    """
+    """)
 
-    mean_duration = df["MOVE_DURATION"].sum() / NB_ANIMALS / NB_DAYS
-    card += f"""
+    parts.append(f"""
     <p style='margin: 0.5em 0;'><strong>Move</strong>: 
-    {str_h_min(mean_duration)} each day
+    {str_h_min(move_duration)} each day
     </p>
-    """
+    """)
 
-    mean_duration = df["STOP_DURATION"].sum() / NB_ANIMALS / NB_DAYS
-    card += f"""
+    parts.append(f"""
     <p style='margin: 0.5em 0;'><strong>Stop</strong>: 
-    {str_h_min(mean_duration)} each day
+    {str_h_min(stop_duration)} each day
     </p>
-    """
+    """)
 
-    mean_duration = df["UNDETECTED_DURATION"].sum() / NB_ANIMALS / NB_DAYS
-    card += f"""
+    parts.append(f"""
     <p style='margin: 0.5em 0;'><strong>Undetected</strong>: 
-    {str_h_min(mean_duration)} each day
+    {str_h_min(undetected_duration)} each day
     </p>
-    """
+    """)
 
-    card += "</div></div>"
-    return card
+    parts.append("</div></div>")
+    return "".join(parts)
 
 
 def get_event_card(
     df: pd.DataFrame,
-    event_list: List[str],
+    event_list: List[str] | None,
     NB_ANIMALS: int,
     NB_DAYS: float,
 ):
-    card = """<div style="flex: 0 0 320px; min-width: 220px;
+    """Card of the average daily count and duration of each event of
+    `event_list` (all the events of `df` if None)."""
+    parts = ["""<div style="flex: 0 0 320px; min-width: 220px;
     max-width: 400px;"> <div style="margin:0; padding:0;">
-    """
-    for event in event_list:
-        mean_count = round(
-            df[df["EVENT"] == event]["EVENT_COUNT"].sum()
-            / NB_ANIMALS
-            / NB_DAYS
-        )
-        mean_duration = round(
-            df[df["EVENT"] == event]["DURATION"].sum() / NB_ANIMALS / NB_DAYS
-        )
-        card += f"""
+    """]
+    # totals of all events in a single pass over the event codes (in order
+    # of appearance, missing events are dropped)
+    codes, events = pd.factorize(df["EVENT"])
+    kept = codes >= 0
+    totals = pd.DataFrame(
+        {
+            column: np.bincount(
+                codes[kept],
+                weights=df[column].to_numpy(dtype=np.float64)[kept],
+                minlength=len(events),
+            )
+            for column in ["EVENT_COUNT", "DURATION"]
+        },
+        index=pd.Index(events, name="EVENT"),
+    )
+    if event_list is not None:
+        totals = totals.reindex(event_list, fill_value=0)
+    # daily means per animal of all the events at once
+    daily_means = totals.to_numpy() / NB_ANIMALS / NB_DAYS
+    for event, (mean_count, mean_duration) in zip(totals.index, daily_means):
+        mean_count = round(mean_count)
+        mean_duration = round(mean_duration)
+        parts.append(f"""
         <p style='margin:0;'><strong>{event}</strong></p>
         <ul style='margin:0;'>
             <li>{str_h_min(mean_duration)} each day</li>
             <li>{mean_count} event each day</li>
         </ul>
-        """
+        """)
 
-    card += "</div></div>"
-    return card
+    parts.append("</div></div>")
+    return "".join(parts)
 
 
 def get_sensors_card(df: pd.DataFrame):
@@ -350,27 +397,31 @@ def get_sensors_card(df: pd.DataFrame):
         "?",
     ]
 
-    card = """<div style="flex: 0 0 320px; min-width: 220px;
+    # mean and std of all the available sensors in a single call
+    columns = [s + "_MEAN" for s in sensors if s + "_MEAN" in df.columns]
+    stats = df[columns].agg(["mean", "std"]) if columns else pd.DataFrame()
+
+    parts = ["""<div style="flex: 0 0 320px; min-width: 220px;
     max-width: 400px;"> <div style="margin:0; padding:0;">
-    """
+    """]
     for sensor, label, unit in zip(sensors, sensors_labels, units):
-        if (
-            sensor + "_MEAN" not in df.columns
-            or df[sensor + "_MEAN"].isnull().all()
+        # the mean is NaN if the column only has null values
+        if sensor + "_MEAN" not in stats.columns or pd.isna(
+            stats.at["mean", sensor + "_MEAN"]
         ):
-            card += (
+            parts.append(
                 "<p style='margin: 0.5em 0;'>"
                 f"{label} data not available"
                 "</p>"
             )
         else:
-            mean = round(df[sensor + "_MEAN"].mean(), 2)
-            std = round(df[sensor + "_MEAN"].std(), 2)
-            card += (
+            mean = round(stats.at["mean", sensor + "_MEAN"], 2)
+            std = round(stats.at["std", sensor + "_MEAN"], 2)
+            parts.append(
                 f"<p style='margin: 0.5em 0;'>{label} : "
                 f"<strong>{mean}</strong> <span>&plusmn;</span> "
                 f"{std} <i>{unit}</i>"
                 "</p>"
             )
-    card += "</div></div>"
-    return card
+    parts.append("</div></div>")
+    return "".join(parts)
@@ -9,6 +9,7 @@ from dim_c_brains.scripts.reports_manager import HTMLReportManager
 from dim_c_brains.scripts.settings import AnalysisSettings
 from dim_c_brains.scripts.plotting_functions import (
     draw_nights,
+    get_nights,
     line_with_shade,
 )
 
@@ -17,9 +18,13 @@ def generic_reports(
     report_manager: HTMLReportManager,
     df: pd.DataFrame | None,
     settings: AnalysisSettings,
+    max_points: int | None = 2000,
 ):
     """Get all sensors datas in a dataframe using the given dataframe and
     construct all the generic reports into the given `HTMLReportManager`.
+
+    Sensor lines longer than `max_points` bins are downsampled in the
+    figures (see `line_with_shade`), the downloadable data stays complete.
     """
 
     report_manager.reports_creation_focus("Sensors")
@@ -51,6 +56,8 @@ def generic_reports(
         "night_begin": settings.night_begin,
         "night_duration": settings.night_duration,
     }
+    # night periods, shared by all the figures over time
+    nights_parameters["nights"] = get_nights(**nights_parameters)
 
     sensors = [
         "TEMPERATURE",
@@ -146,6 +153,7 @@ def generic_reports(
                 mean_col,
                 y_min_col=min_col,
                 y_max_col=max_col,
+                max_points=max_points,
             )
             fig = draw_nights(fig, **nights_parameters)
 
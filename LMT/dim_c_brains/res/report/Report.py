@@ -7,9 +7,10 @@ Created on 5 févr. 2025
 import os
 
 from jinja2 import Environment, FileSystemLoader
-from dim_c_brains.res.report.ReportTools import clean_filename
+from dim_c_brains.res.report.ReportTools import clean_filename, write_xlsx
 from datetime import datetime
 import pandas as pd
+from pathlib import Path
 
 '''
 # Create the jinja2 environment.
@@ -20,6 +21,9 @@ env = Environment(loader=FileSystemLoader(current_directory))
 class Report(object):
 
     def __init__(self , title, data, template="contentCard.html", experimentName="main",  style = "primary", options= {} ):
+        '''
+        data supports html, or the path of a file containing the html
+        '''
         
         self.title = title
         self.data = data
@@ -35,7 +39,7 @@ class Report(object):
         
     def setDownloadableContent(self , name , content ):
         '''
-        content supports dataframe
+        content supports dataframe, or the path of a pickled dataframe
         '''
         self.downloadableContent[name] = content 
     
@@ -75,7 +79,7 @@ class Report(object):
             s = f"{self.experimentName} {self.title}"
             s = clean_filename( s )
             fileNameXLS = f"{s}.xlsx"
-            df.to_excel( f"{outFolder}/{fileNameXLS}" )
+            write_xlsx( df, f"{outFolder}/{fileNameXLS}" )
             print(f"Xlsx file is : {fileNameXLS}")
             render = env.get_template( self.template ).render( title=numberInTitle+self.title, content=self.data, fileNameXLS=fileNameXLS, style=self.style, **self.options )
             
@@ -86,12 +90,15 @@ class Report(object):
         extraDownloadContent =""
         
         for k,v in self.downloadableContent.items():            
+            if isinstance(v, Path):
+                # dataframe stored on disk (pickle)
+                v = pd.read_pickle( v )
             if isinstance(v, pd.DataFrame):                
                 df = v
                 s = f"{self.experimentName} {self.title} {k}"
                 s = clean_filename( s )
                 fileNameXLS = f"{s}.xlsx"
-                df.to_excel( f"{outFolder}/{fileNameXLS}" )
+                write_xlsx( df, f"{outFolder}/{fileNameXLS}" )
                 print(f"Xlsx file is : {fileNameXLS}")
                 extraDownloadContent+=f"<a href='{fileNameXLS}' >{k}</a><br>"
             else:
@@ -100,7 +107,12 @@ class Report(object):
                 quit()
         
         
-        render = env.get_template( self.template ).render( title=numberInTitle+self.title, content=self.data, style = self.style, extraDownloadContent=extraDownloadContent, **self.options )
+        content = self.data
+        if isinstance(content, Path):
+            # html stored on disk
+            content = content.read_text( encoding="utf-8" )
+
+        render = env.get_template( self.template ).render( title=numberInTitle+self.title, content=content, style = self.style, extraDownloadContent=extraDownloadContent, **self.options )
         
         return render
         
@@ -95,7 +95,8 @@ class WebSite(object):
     
     def renderReportList(self , reportList, templateFolder , outFolder, experimentName, showMenuItem=True ):
         
-        content =""
+        # html parts of the page, joined once at the end
+        content = []
         
         '''
         if showMenuItem:
@@ -119,38 +120,35 @@ class WebSite(object):
             
             t2 = ""
             t2+="<ul>"
-            for report in reportList:
-                i = reportList.index( report )
+            for i, report in enumerate( reportList ):
                 t2+=f"<li><a href='#report{i}' style='text-decoration:none;color:inherit;'>{report.title}</a></li>"
             t2+="</ul>"
-            content+=self.collapse( t1 , t2 )
+            content.append( self.collapse( t1 , t2 ) )
         
          
         
         inRow = False
-        for report in reportList:                
-            
-            number=reportList.index( report )
+        for number, report in enumerate( reportList ):                
             
             if report.template.lower() != "minicard.html": # fixme: if the anchor is present, it generates a line break
-                content+= f"<a name='report{number}'></a>"
+                content.append( f"<a name='report{number}'></a>" )
             
             if report.template.lower() == "minicard.html":
                 
                 if inRow == False:
-                    content+="<div class='row'>"
+                    content.append( "<div class='row'>" )
                     inRow=True
-                content+= self.miniCard( report.title, report.data, style = report.style )
+                content.append( self.miniCard( report.title, report.data, style = report.style ) )
                 continue                
                 
             if inRow:
-                content+="</div>"
+                content.append( "</div>" )
                 inRow = False    
             
             
-            content+= report.render( templateFolder=templateFolder, outFolder = outFolder, reportList=reportList )
+            content.append( report.render( templateFolder=templateFolder, outFolder = outFolder, reportList=reportList ) )
         
-        return content
+        return "".join( content )
 
     def cache(self, file ):
         if self.cacheFolder==None:
@@ -242,16 +240,14 @@ class WebSite(object):
             content += self.renderReportList( experimentMain.reportList , templateFolder, outFolder, "Main" )
             experimentMainTimeGenerationInS = experimentMain.getGenerationTimeInS()
             
-        mainHTML = env.get_template( "index.html").render( 
+        # the page is written while it is rendered
+        env.get_template( "index.html").stream( 
             mainContentTitle="Overview", 
             content = content,
             generationDate= self.nowStr(),
             experimentList= self.experimentManager.getExperimentListAsNameURL(), 
             timeForGeneration = experimentMainTimeGenerationInS
-            )
-                
-        with open( outFolder+"index.html", "w", encoding='utf-8' ) as text_file:
-            text_file.write( mainHTML )
+            ).dump( outFolder+"index.html", encoding='utf-8' )
         
         # Sub pages generation
         
@@ -266,17 +262,14 @@ class WebSite(object):
                  
             content += self.renderReportList( experiment.reportList , templateFolder, outFolder, experiment.name  )
                             
-            # put content in main            
-            mainHTML = env.get_template( "index.html").render(                 
+            # put content in main, written while it is rendered            
+            env.get_template( "index.html").stream(                 
                 content = content,
                 generationDate = datetime.now().strftime("%d-%b-%Y %H:%M:%S"),
                 timeForGeneration = experiment.getGenerationTimeInS(),
                 experimentList = self.experimentManager.getExperimentListAsNameURL(),
                 title = "<small>MiceCraft Reports</small> - " + experiment.name
-                )
-            
-            with open( outFolder+experimentFile, "w", encoding='utf-8' ) as text_file:
-                text_file.write( mainHTML )
+                ).dump( outFolder+experimentFile, encoding='utf-8' )
          
     def upload(self, localFolder, remoteFolder ):
         
@@ -96,7 +96,7 @@ class AnalysesComparator:
 
         # EVENTS
         # ----------------
-        all_event_df = None
+        event_dfs = []
         for event_table_name in self.get_common_events():
 
             event_df = pd.merge(
@@ -129,10 +129,13 @@ class AnalysesComparator:
             if event_df.empty:
                 continue
 
-            if all_event_df is None:
-                all_event_df = event_df
-            else:
-                all_event_df = pd.concat([all_event_df, event_df])
+            event_dfs.append(event_df)
+
+        # a single concatenation, event names are stored as categories
+        if event_dfs:
+            all_event_df = pd.concat(event_dfs).astype({"EVENT": "category"})
+        else:
+            all_event_df = None
 
         # OVERVIEW
         # ----------------
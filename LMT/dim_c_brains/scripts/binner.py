@@ -3,6 +3,7 @@
 """
 
 from sqlite3 import Connection
+import numpy as np
 import pandas as pd
 from typing import Any, Dict, List, Literal
 
@@ -18,10 +19,7 @@ class Binner:
         """Get the last FRAMENUMBER and TIMESTAMP from LMT FRAME table. Useful
         to initialize the Binner with the correct time reference."""
         query = "SELECT FRAMENUMBER, TIMESTAMP FROM FRAME ORDER BY FRAMENUMBER DESC LIMIT 1"
-        cursor = connection.cursor()
-        cursor.execute(query)
-        result = cursor.fetchone()
-        cursor.close()
+        result = connection.execute(query).fetchone()
 
         if not result:
             raise ValueError("No data found in FRAME table")
@@ -80,22 +78,39 @@ class Binner:
         print(f"Experiment started at {self.frame_to_time(1)}")
 
     def frame_to_time(self, framenumber: int) -> pd.Timestamp:
-        """Convert a frame number to a pandas Timestamp."""
-        time_delta = pd.to_timedelta(framenumber / self.fps, unit="s")
-        return self.time_0 + time_delta
+        """Convert a frame number to a pandas Timestamp.
+
+        The result is cached, the cache is reset each time the parameters
+        are set.
+        """
+        time = self._frame_to_time_cache.get(framenumber)
+        if time is None:
+            time = pd.Timestamp(self.frames_to_datetime64(framenumber))
+            self._frame_to_time_cache[framenumber] = time
+        return time
+
+    def frames_to_datetime64(self, frames: Any) -> np.ndarray:
+        """Convert an array of frame numbers to a numpy datetime64[ns] array,
+        using integer arithmetic only (no pandas Timestamp per frame)."""
+        frames = np.asarray(frames, dtype=np.int64)
+        # nanoseconds since time_0, rounded to the nearest nanosecond
+        ns = (frames * 1_000_000_000 + self.fps // 2) // self.fps
+        return self._time_0_ns + ns.astype("timedelta64[ns]")
 
     def time_to_frame(self, time: pd.Timestamp) -> int:
         """Convert a pandas Timestamp to a frame number."""
-        time_delta = time - self.time_0
-        return round(time_delta.total_seconds() * self.fps)
+        return self.timedelta_to_frames(time - self.time_0)
 
     def timedelta_to_frames(self, delta: pd.Timedelta) -> int:
         """Convert a pandas Timedelta to number of frames."""
-        return round(delta.total_seconds() * self.fps)
+        # integer nanoseconds, rounded half up (as `frames_to_datetime64`)
+        return (delta.value * self.fps * 2 + 1_000_000_000) // 2_000_000_000
 
     def frames_to_timedelta(self, frames: int) -> pd.Timedelta:
         """Convert number of frames to a pandas Timedelta."""
-        return pd.Timedelta(seconds=frames / self.fps)
+        return pd.Timedelta(
+            (frames * 1_000_000_000 + self.fps // 2) // self.fps, unit="ns"
+        )
 
     def set_parameters(
         self,
@@ -110,17 +125,28 @@ class Binner:
         Also initialize the reference time (time_0) that correspond to bin_0
         with appropriate timezone offset and the bin dataframe (bin_df).
         """
+        self._bin_times_cache: Dict[
+            tuple[tuple[int, int], ...], tuple[pd.DatetimeIndex, ...]
+        ] = {}
+        self._frame_to_time_cache: Dict[int, pd.Timestamp] = {}
+
         if fps is not None:
             if fps < 1:
                 raise ValueError("FPS must be at least 1")
             self.fps = fps
 
-        timestamp_0 = self.last_timestamp - (self.last_frame / self.fps * 1000)
+        # time of frame 0 in integer nanoseconds (no float rounding)
+        time_0_ns = (
+            self.last_timestamp * 1_000_000
+            - self.frames_to_timedelta(self.last_frame).value
+            + self.utc_offset.value
+        )
         self.bin_0: Dict[str, Any] = {
             "FRAMENUMBER": 0,
-            "TIMESTAMP": timestamp_0 + self.utc_offset.total_seconds() * 1000,
+            "TIMESTAMP": time_0_ns / 1_000_000,
         }
-        self.time_0 = pd.to_datetime(timestamp_0, unit="ms") + self.utc_offset
+        self.time_0 = pd.Timestamp(time_0_ns, unit="ns")
+        self._time_0_ns = np.datetime64(time_0_ns, "ns")
 
         if isinstance(bin_size, pd.Timedelta):
             bin_size = self.timedelta_to_frames(bin_size)
@@ -176,31 +202,38 @@ class Binner:
             start_frame_bin_1 = 1
 
         # calculate starting frame of each bins until last frame
-        bin_start_frames: List[int] = []
-        f = start_frame_bin_1 - self.bin_size
-        while f < self.last_frame:
-            bin_start_frames.append(f)
-            f += self.bin_size
+        bin_start_frames = np.arange(
+            start_frame_bin_1 - self.bin_size,
+            self.last_frame,
+            self.bin_size,
+            dtype=np.int64,
+        )
+        bin_end_frames = bin_start_frames + self.bin_size - 1
 
         # create the dataframe with all bin information
-        list_df = []
-        for f in bin_start_frames:
-            start_frame = f if f > 0 else 1
-            end_frame = (
-                f + self.bin_size - 1
-                if f <= self.last_frame
-                else self.last_frame
-            )
-            list_df.append(
-                {
-                    "START_FRAME": start_frame,
-                    "END_FRAME": end_frame,
-                    "START_TIME": self.frame_to_time(f),
-                    "END_TIME": self.frame_to_time(f + self.bin_size - 1),
-                }
-            )
+        self.bin_df = pd.DataFrame(
+            {
+                "START_FRAME": np.where(
+                    bin_start_frames > 0, bin_start_frames, 1
+                ),
+                "END_FRAME": np.where(
+                    bin_start_frames <= self.last_frame,
+                    bin_end_frames,
+                    self.last_frame,
+                ),
+                "START_TIME": self.frames_to_datetime64(bin_start_frames),
+                "END_TIME": self.frames_to_datetime64(bin_end_frames),
+            }
+        )
+
+        # bins between start_frame and end_frame, clipped to these limits
+        starts = np.maximum(self.bin_df["START_FRAME"], self.start_frame)
+        ends = np.minimum(self.bin_df["END_FRAME"], self.end_frame)
+        mask = (ends > self.start_frame) & (starts < self.end_frame)
+        self._bin_iterator: List[tuple[int, int]] = list(
+            zip(starts[mask].tolist(), ends[mask].tolist())
+        )
 
-        self.bin_df = pd.DataFrame(list_df)
         return self.bin_df
 
     def get_bin_list(
@@ -254,27 +287,33 @@ class Binner:
     def get_bin_iterator(self):
         """Get a bin iterator (list of (start, end) tuples) between
         'self.start_frame' and 'self.end_frame'.
-        """
 
-        frames_start = self.get_bin_list("START")
-        frames_end = self.get_bin_list("END")
+        The bins are computed once with the bin dataframe, each call returns
+        a new list.
+        """
 
-        if frames_start[0] < self.start_frame:
-            frames_start[0] = self.start_frame
+        return list(self._bin_iterator)
 
-        if frames_end[-1] > self.end_frame:
-            frames_end[-1] = self.end_frame
+    def get_bin_times(self, bin_iterator: List[tuple[int, int]]):
+        """Get the start and end times (as pandas DatetimeIndex) of each bin
+        of the given bin iterator (list of (start, end) tuples).
 
-        bin_iterator: List[tuple[int, int]] = []
-        for start, end in zip(frames_start, frames_end):
-            if end > self.start_frame and start < self.end_frame:
-                if start < self.start_frame:
-                    start = self.start_frame
-                if end > self.end_frame:
-                    end = self.end_frame
-                bin_iterator.append((start, end))
+        The result is cached, so successive dataframes built on the same bins
+        do not convert frames to times again. The cache is reset each time
+        the parameters are set.
+        """
+        key = tuple(bin_iterator)
+        if key not in self._bin_times_cache:
+            frames = np.array(bin_iterator, dtype=np.int64).reshape(-1, 2)
+            start_times = pd.DatetimeIndex(
+                self.frames_to_datetime64(frames[:, 0])
+            )
+            end_times = pd.DatetimeIndex(
+                self.frames_to_datetime64(frames[:, 1])
+            )
+            self._bin_times_cache[key] = (start_times, end_times)
 
-        return bin_iterator
+        return self._bin_times_cache[key]
 
     def split_iterator_in_chunks(
         self,
@@ -284,8 +323,15 @@ class Binner:
         """Split the given bin iterator (list of (start, end) tuples), in
         chunks of chunk_size (in *frames* or *timedelta*). Useful to split the
         processing of bins in smaller chunks for memory usage reduction.
+
+        Every bin belongs to exactly one chunk: the last chunk holds the
+        remaining bins even if they span less than chunk_size, and an empty
+        bin iterator gives no chunk.
         """
 
+        if not bin_iterator:
+            return []
+
         if isinstance(chunk_size, pd.Timedelta):
             chunk_size = self.timedelta_to_frames(chunk_size)
 
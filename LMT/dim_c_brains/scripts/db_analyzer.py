@@ -34,23 +34,18 @@ class DatabaseAnalyzer:
         """
         connection = sqlite3.connect(str(database_path))
 
-        query = """
-            SELECT
-                COUNT(DISTINCT RFID) AS n_animals,
-                (SELECT FRAMENUMBER FROM FRAME ORDER BY FRAMENUMBER ASC LIMIT 1) AS first_frame,
-                (SELECT TIMESTAMP FROM FRAME ORDER BY FRAMENUMBER ASC LIMIT 1) AS first_timestamp,
-                (SELECT FRAMENUMBER FROM FRAME ORDER BY FRAMENUMBER DESC LIMIT 1) AS last_frame,
-                (SELECT TIMESTAMP FROM FRAME ORDER BY FRAMENUMBER DESC LIMIT 1) AS last_timestamp
-            FROM ANIMAL;
-        """
-        cursor = connection.cursor()
-        cursor.execute(query)
-        result = cursor.fetchone()
-        n_animals: int = result[0]
-        start_frame: int = result[1]
-        start_timestamp: int = result[2]
-        end_frame: int = result[3]
-        end_timestamp: int = result[4]
+        n_animals: int = connection.execute(
+            "SELECT COUNT(DISTINCT RFID) FROM ANIMAL"
+        ).fetchone()[0]
+        # first and last rows of FRAME, each read with a single lookup
+        start_frame, start_timestamp = connection.execute(
+            "SELECT FRAMENUMBER, TIMESTAMP FROM FRAME "
+            "ORDER BY FRAMENUMBER ASC LIMIT 1"
+        ).fetchone()
+        end_frame, end_timestamp = connection.execute(
+            "SELECT FRAMENUMBER, TIMESTAMP FROM FRAME "
+            "ORDER BY FRAMENUMBER DESC LIMIT 1"
+        ).fetchone()
         start_time: pd.Timestamp = pd.to_datetime(start_timestamp, unit="ms")
         end_time: pd.Timestamp = pd.to_datetime(end_timestamp, unit="ms")
         duration: pd.Timedelta = end_time - start_time
@@ -145,8 +140,8 @@ class DatabaseAnalyzer:
         if self.settings.rebuild_events:
             events_to_rebuild = self.settings.events
         else:
-            events_to_rebuild = (
-                self.settings.events - rebuilder.get_events_in_database()
+            events_to_rebuild = rebuilder.get_missing_events(
+                self.settings.events
             )
 
         rebuilder.rebuild(events_to_rebuild, progress_callback)
@@ -234,6 +229,9 @@ class DatabaseAnalyzer:
         # EVENTS
         # ----------------
         if all_event_df is not None:
+            # same categories for all events, kept by the concatenation
+            event_dtype = pd.CategoricalDtype(sorted_events)
+            event_dfs = [all_event_df]
             for event_name in sorted_events:
                 event_df = df_constructor.get_df_event(
                     event_name,
@@ -251,9 +249,11 @@ class DatabaseAnalyzer:
                     event_name,
                     self.settings,
                 )
-                all_event_df = pd.concat([all_event_df, event_df])
+                if event_df is not None:
+                    event_dfs.append(event_df.astype({"EVENT": event_dtype}))
                 progression[0] += 1
                 self.update_progression(*progression)
+            all_event_df = pd.concat(event_dfs)
 
         # SENSORS
         # ----------------
@@ -2,17 +2,47 @@
 @author: xmousset
 """
 
+import os
+import sqlite3
+import logging
 import numpy as np
 import pandas as pd
-from typing import Any, Literal
+from pathlib import Path
+from typing import Any, Iterator, Literal
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 
 from sqlite3 import Connection
 
 from dim_c_brains.scripts.binner import Binner
 
 from lmtanalysis.Measure import oneMinute, oneHour, oneDay
-from lmtanalysis.Event import EventTimeLine
 from lmtanalysis.Animal import Animal, AnimalPool
+from lmtanalysis.Detection import Detection
+
+logger = logging.getLogger(__name__)
+
+READ_PRAGMAS = (
+    "cache_size=-262144",  # 256 MiB of page cache
+    "mmap_size=30000000000",
+    "temp_store=MEMORY",
+)
+"""SQLite settings applied to the connection for the read-heavy queries of
+`DataframeConstructor`. They only last as long as the connection."""
+
+EVENT_NAME_INDEX = (
+    "CREATE INDEX IF NOT EXISTS eventNameAnimalStartIndex "
+    "ON EVENT (NAME, IDANIMALA, STARTFRAME)"
+)
+"""Index of the events by name, animal and start frame."""
+
+ANALYSIS_INDEXES = (
+    EVENT_NAME_INDEX,
+    "CREATE INDEX IF NOT EXISTS detectionFastLoadXYIndex "
+    "ON DETECTION (ANIMALID, FRAMENUMBER, MASS_X, MASS_Y)",
+)
+"""Indexes used by the queries of `DataframeConstructor` (the second one is
+also built by `lmtanalysis.BuildDataBaseIndex`)."""
 
 
 class DataframeConstructor:
@@ -34,6 +64,9 @@ class DataframeConstructor:
         analysis_area: tuple[int, int, int, int] | None = None,
         fps: int = 30,
         utc_offset: float = 0.0,
+        n_jobs: int = 1,
+        dtype_backend: Literal["numpy", "pyarrow"] = "numpy",
+        detection_cache_size: int = 1,
     ):
         """
         instanciate pandas dataframes constructor. All datas will be binned
@@ -62,9 +95,33 @@ class DataframeConstructor:
             fps (int, optional): Frames per second. Defaults to 30.
             utc_offset (float, optional): UTC offset in hours for correct
                 timezone conversion (e.g. *+9.0* for Tokyo). Defaults to *0.0*.
+            n_jobs (int, optional): Number of processes used to process the
+                data chunks in parallel (*-1* to use all CPUs). Only used if
+                the connection is linked to a database file. Defaults to *1*
+                (no parallelization).
+            dtype_backend (str, optional): Backend of the returned DataFrames
+                columns. With *"pyarrow"* (requires the optional `pyarrow`
+                package), columns are stored as Arrow arrays, which use less
+                memory and make the concatenation of chunks cheaper.
+                Defaults to *"numpy"*.
+            detection_cache_size (int, optional): Number of loaded detection
+                chunks kept in memory, so that processing the same frames
+                again (e.g. activity then trajectory) does not reload them
+                from the database. Defaults to *1* (only the last chunk).
+
+        Note:
+            `READ_PRAGMAS` are applied to `connection` (larger page cache,
+            memory-mapped I/O), so it should preferably be a connection
+            dedicated to the analysis. Missing `ANALYSIS_INDEXES` are
+            created in the database if it is writable.
         """
+        for pragma in READ_PRAGMAS:
+            connection.execute(f"PRAGMA {pragma}")
+        self._create_indexes(connection)
+
         self.animal_pool = AnimalPool()
         self.animal_pool.loadAnimals(connection)
+        self._load_animal_snapshot()
 
         last_framenumber, last_timestamp = Binner.get_last_frame(connection)
         self.binner = Binner(
@@ -80,6 +137,60 @@ class DataframeConstructor:
         self.processing_window = processing_window
         self.analysis_area = analysis_area
         """(x_min, y_min, x_max, y_max) in *cm*. If None, analyze all data."""
+        self.n_jobs = n_jobs if n_jobs > 0 else (os.cpu_count() or 1)
+        self.dtype_backend = dtype_backend
+        self.detection_cache_size = detection_cache_size
+        self._detection_cache: OrderedDict[
+            tuple[int, int, tuple[int, int, int, int] | None],
+            list[tuple[np.ndarray, np.ndarray, np.ndarray]],
+        ] = OrderedDict()
+        """Loaded (frames, mass x, mass y) of each animal, by (start, end,
+        analysis_area),
+        from the least to the most recently used."""
+        self._event_frames_cache: dict[
+            tuple[int | None, str, int, int], tuple[np.ndarray, np.ndarray]
+        ] = {}
+        """Merged event frames, by (animal id, event, min_frame, max_frame).
+        Filled by `_load_event_frames`."""
+        self._event_df_cache: dict[tuple, pd.DataFrame | None] = {}
+        """Event DataFrames, by (event, event_min_duration, binning key).
+        Filled by `get_df_event`."""
+        self._sensors_df_cache: dict[tuple, pd.DataFrame | None] = {}
+        """Sensors DataFrames, by binning key. Filled by `get_df_sensors`."""
+        self.database_path = None
+        """Path of the database file, None if the database is in memory."""
+        for _, name, file in connection.execute("PRAGMA database_list"):
+            if name == "main" and file:
+                self.database_path = file
+        self._sensors_sql: str | None = None
+        """Sensors SELECT statement, built once by `get_sensors_query`."""
+        self._available_sensors: list[str] = []
+
+    @staticmethod
+    def _create_indexes(connection: Connection):
+        """Create the missing `ANALYSIS_INDEXES`, so that events and
+        detections are read with index seeks instead of table scans. Nothing
+        is done if the database is read-only (or locked)."""
+        try:
+            for statement in ANALYSIS_INDEXES:
+                connection.execute(statement)
+            connection.commit()
+        except sqlite3.OperationalError as error:
+            logger.debug("Analysis indexes not created: %s", error)
+
+    def _load_animal_snapshot(self):
+        """Snapshot the animals of the pool, with their ids and RFIDs, so
+        that chunk processing does not iterate over the pool again. Must be
+        called again if the animal pool changes."""
+        self._animals: list[Animal] = self.animal_pool.getAnimalList()
+        self._animal_ids: list[int] = [a.baseId for a in self._animals]
+        self._animal_rfids: list[str] = [a.RFID for a in self._animals]
+        self._rfid_dtype = pd.CategoricalDtype(
+            sorted(str(rfid) for rfid in self._animal_rfids), ordered=True
+        )
+        self._rfid_codes = self._rfid_dtype.categories.get_indexer(
+            [str(rfid) for rfid in self._animal_rfids]
+        )
 
     def set_bin_window(self, bin_window: int | pd.Timedelta):
         """Set the bin window (in *frames* or *pandas.Timedelta*) for data
@@ -148,53 +259,430 @@ class DataframeConstructor:
         else:
             raise ValueError("Invalid unit. Choose 'FRAME' or 'TIME'.")
 
+    def _binning_key(self) -> tuple:
+        """Parameters of the binner defining the bins of a DataFrame. Cached
+        DataFrames are only reused while this key is unchanged."""
+        binner = self.binner
+        return (
+            binner.fps,
+            binner.time_0,
+            binner.bin_size,
+            binner.bin_rounding,
+            binner.start_frame,
+            binner.end_frame,
+            self.processing_window,
+        )
+
     def get_df_animals(self):
         """Get a DataFrame containing basic information about all animals."""
-        print(f"Creating ANIMALS dataframe")
+        logger.info("Creating ANIMALS dataframe")
         df = pd.read_sql("SELECT * FROM ANIMAL", self.animal_pool.conn)
 
         return df
 
-    def count_event_per_bin(
+    def _load_detection(
+        self, start: int, end: int
+    ) -> list[tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """Load the mass positions of all animals between `start` and `end`
+        frames in a single query, filtered by the analysis area. Detections
+        are served from the cache if these frames have already been loaded.
+
+        As `Animal.loadDetection`, detections with a mass x below 10 are
+        ignored.
+
+        Returns
+        -------
+        list (one item per animal) of tuple of three arrays
+            frames (sorted), mass x and mass y in *pixels*
+        """
+        key = (start, end, self.analysis_area)
+
+        if key in self._detection_cache:
+            self._detection_cache.move_to_end(key)
+            return self._detection_cache[key]
+
+        cursor = self.animal_pool.conn.execute(
+            "SELECT ANIMALID, FRAMENUMBER, MASS_X, MASS_Y FROM DETECTION "
+            "WHERE FRAMENUMBER BETWEEN ? AND ? "
+            f"AND ANIMALID IN ({', '.join('?' * len(self._animal_ids))})",
+            [start, end, *self._animal_ids],
+        )
+        rows = np.fromiter(
+            cursor,
+            dtype=[
+                ("ANIMALID", np.int64),
+                ("FRAMENUMBER", np.int64),
+                ("MASS_X", np.float64),
+                ("MASS_Y", np.float64),
+            ],
+        )
+        rows = rows[rows["MASS_X"] >= 10]
+        rows = rows[np.lexsort((rows["FRAMENUMBER"], rows["ANIMALID"]))]
+
+        detections = []
+        for animal, animal_id in zip(self._animals, self._animal_ids):
+            first = np.searchsorted(rows["ANIMALID"], animal_id, "left")
+            last = np.searchsorted(rows["ANIMALID"], animal_id, "right")
+            animal_rows = rows[first:last]
+
+            if self.analysis_area is not None:
+                x1, y1, x2, y2 = self.analysis_area
+                corner = animal.parameters.cornerCoordinatesOpenFieldArea[0]
+                scale_factor = animal.parameters.scaleFactor
+                x = (animal_rows["MASS_X"] - corner[0]) * scale_factor
+                y = (animal_rows["MASS_Y"] - corner[1]) * scale_factor
+                animal_rows = animal_rows[
+                    (x >= x1) & (x <= x2) & (y >= y1) & (y <= y2)
+                ]
+
+            detections.append(
+                (
+                    animal_rows["FRAMENUMBER"].copy(),
+                    animal_rows["MASS_X"].copy(),
+                    animal_rows["MASS_Y"].copy(),
+                )
+            )
+
+        if self.detection_cache_size > 0:
+            self._detection_cache[key] = detections
+            while len(self._detection_cache) > self.detection_cache_size:
+                self._detection_cache.popitem(last=False)
+
+        return detections
+
+    def _set_detection_dictionaries(
+        self, detections: list[tuple[np.ndarray, np.ndarray, np.ndarray]]
+    ):
+        """Fill the detection dictionary of each animal with (light)
+        detections, for the `Animal` methods that rely on it."""
+        for animal, (frames, x, y) in zip(self._animals, detections):
+            animal.detectionDictionary = {
+                frame: Detection(mass_x, mass_y, lightLoad=True)
+                for frame, mass_x, mass_y in zip(
+                    frames.tolist(), x.tolist(), y.tolist()
+                )
+            }
+
+    def _rfid_column(self, nb_repeats: int) -> pd.Categorical:
+        """RFID column repeating the RFID of each animal `nb_repeats` times,
+        built from the category codes (no string is created per row)."""
+        return pd.Categorical.from_codes(
+            np.repeat(self._rfid_codes, nb_repeats), dtype=self._rfid_dtype
+        )
+
+    def _set_rfid_category(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Store the RFID column of `df` as an ordered categorical, sharing
+        the same categories (all animals RFID) for every processed chunk so
+        that chunks can be concatenated without falling back to strings."""
+        if "RFID" not in df.columns:
+            return df
+        df["RFID"] = df["RFID"].astype(str).astype(self._rfid_dtype)
+        return df
+
+    def _convert_dtype_backend(
+        self, df: pd.DataFrame | None
+    ) -> pd.DataFrame | None:
+        """Convert the columns of a processed chunk to the `dtype_backend`
+        of the constructor (nothing to do for the numpy backend)."""
+        if df is None or self.dtype_backend == "numpy":
+            return df
+        return df.convert_dtypes(dtype_backend=self.dtype_backend)
+
+    def _rechunk(self, df: pd.DataFrame | None) -> pd.DataFrame | None:
+        """Merge the Arrow chunks of each column after chunks concatenation,
+        so that later computations work on contiguous arrays."""
+        if df is None or self.dtype_backend != "pyarrow":
+            return df
+        for col in df.columns:
+            if isinstance(df[col].dtype, pd.ArrowDtype):
+                chunked_array = df[col].array.__arrow_array__()
+                if chunked_array.num_chunks > 1:
+                    df[col] = pd.arrays.ArrowExtensionArray(
+                        chunked_array.combine_chunks()
+                    )
+        return df
+
+    @staticmethod
+    def _write_parquet_chunk(
+        writer: Any,
+        output_path: Path,
+        df: pd.DataFrame | None,
+    ):
+        """Append a processed chunk to the parquet file at `output_path`. The
+        writer is created on the first non-empty chunk and returned so it can
+        be reused for the next chunks (it must be closed by the caller).
+
+        Requires the optional `pyarrow` package.
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if df is None or df.empty:
+            return writer
+
+        if writer is None:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            writer = pq.ParquetWriter(
+                output_path, table.schema, compression="zstd"
+            )
+        else:
+            table = pa.Table.from_pandas(
+                df, schema=writer.schema, preserve_index=False
+            )
+        writer.write_table(table)
+        return writer
+
+    def _process_chunks(
         self,
-        animal: Animal,
-        event: str,
+        method_name: str,
+        split_iterator: list[list[tuple[int, int]]],
+        label: str,
+        **kwargs: Any,
+    ) -> Iterator[pd.DataFrame | None]:
+        """Yield, in order, the dataframe returned by the `method_name` method
+        for each chunk (bin_iterator) of `split_iterator`. Other keyword
+        arguments are passed to the method.
+
+        If `self.n_jobs` > 1, chunks are processed in parallel in separate
+        processes, each one with its own read-only database connection.
+        """
+        if (
+            self.n_jobs <= 1
+            or len(split_iterator) <= 1
+            or self.database_path is None
+        ):
+            for bin_iterator in split_iterator:
+                logger.info(
+                    "%s for frames %d to %d",
+                    label,
+                    bin_iterator[0][0],
+                    bin_iterator[-1][1],
+                )
+                yield self._convert_dtype_backend(
+                    getattr(self, method_name)(
+                        bin_iterator=bin_iterator, **kwargs
+                    )
+                )
+            return
+
+        logger.info("%s with %d processes", label, self.n_jobs)
+        with ProcessPoolExecutor(max_workers=self.n_jobs) as executor:
+            futures = [
+                executor.submit(
+                    _process_chunk,
+                    self.database_path,
+                    self.binner,
+                    self.analysis_area,
+                    method_name,
+                    bin_iterator,
+                    kwargs,
+                )
+                for bin_iterator in split_iterator
+            ]
+            for future in futures:
+                yield self._convert_dtype_backend(future.result())
+
+    def _load_event_frames(
+        self,
+        animals: list[Animal],
+        events: list[str],
+        min_frame: int,
+        max_frame: int,
+    ) -> list[dict[str, tuple[np.ndarray, np.ndarray]]]:
+        """Load the start and end frames of several events for several
+        animals between `min_frame` and `max_frame`, in a single query.
+
+        Events are rebuilt as an EventTimeLine does: they are clipped to the
+        given frames and overlapping (or contiguous) events of the same name
+        are merged together. Results are memoized, so that the same events
+        are read only once from the database for a given range of frames
+        (e.g. by `get_df_event` then `get_df_event_histogram`).
+
+        Returns
+        -------
+        list (one item per animal) of dict of event name -> tuple of two
+        sorted arrays (start frames, end frames)
+        """
+        animal_ids = [animal.baseId for animal in animals]
+        cache = self._event_frames_cache
+        missing_events = [
+            event
+            for event in events
+            if any(
+                (animal_id, event, min_frame, max_frame) not in cache
+                for animal_id in animal_ids
+            )
+        ]
+
+        if missing_events:
+            query = (
+                "SELECT IDANIMALA, NAME, STARTFRAME, ENDFRAME FROM EVENT "
+                f"WHERE NAME IN ({', '.join('?' * len(missing_events))}) "
+                "AND ENDFRAME >= ? AND STARTFRAME <= ?"
+            )
+            params: list[Any] = [*missing_events, min_frame, max_frame]
+            # an animal without id (0 or None) gets the events of all animals
+            if all(animal_ids):
+                query += f" AND IDANIMALA IN ({', '.join('?' * len(animals))})"
+                params.extend(animal_ids)
+
+            df_events = pd.read_sql_query(
+                query,
+                self.animal_pool.conn,
+                params=params,
+                dtype={"STARTFRAME": np.int64, "ENDFRAME": np.int64},
+            )
+            frames_per_event = {
+                key: (
+                    group["STARTFRAME"].to_numpy(),
+                    group["ENDFRAME"].to_numpy(),
+                )
+                for key, group in df_events.groupby(["IDANIMALA", "NAME"])
+            }
+
+            empty = np.array([], dtype=np.int64)
+            for animal_id in animal_ids:
+                for event in missing_events:
+                    if animal_id:
+                        starts, ends = frames_per_event.get(
+                            (animal_id, event), (empty, empty)
+                        )
+                    else:
+                        rows = df_events[df_events["NAME"] == event]
+                        starts = rows["STARTFRAME"].to_numpy()
+                        ends = rows["ENDFRAME"].to_numpy()
+                    cache[(animal_id, event, min_frame, max_frame)] = (
+                        self._merge_event_frames(
+                            np.maximum(starts, min_frame),
+                            np.minimum(ends, max_frame),
+                        )
+                    )
+
+        return [
+            {
+                event: cache[(animal_id, event, min_frame, max_frame)]
+                for event in events
+            }
+            for animal_id in animal_ids
+        ]
+
+    def _events_per_bin_bulk(
+        self,
+        animals: list[Animal],
+        events: list[str],
         event_min_duration: int = 0,
         bin_iterator: list[tuple[int, int]] | None = None,
-    ):
-        """Count occurrences of a specific event according to binning.
+    ) -> list[dict[str, tuple[np.ndarray, np.ndarray]]]:
+        """Count occurrences and durations of several events for several
+        animals according to binning, loading all of them from the database
+        in a single query (see `_load_event_frames`).
 
         Returns
         -------
-        tuple of two lists (counts, durations)
-            counts : list[int]
-                Number of occurrences of the event in each bin.
-            durations : list[int]
-                Total duration (in frames) of the event in each bin.
+        list (one item per animal) of dict of event name -> tuple of two
+        arrays (counts, durations)
+            See `count_event_per_bin`.
         """
 
         if bin_iterator is None:
             bin_iterator = [(self.binner.start_frame, self.binner.end_frame)]
 
-        event_timeline = EventTimeLine(
-            self.animal_pool.conn,
-            event,
-            idA=animal.baseId,
-            minFrame=bin_iterator[0][0],
-            maxFrame=bin_iterator[-1][1],
-        )
-        event_timeline.removeEventsBelowLength(maxLen=event_min_duration)
-
-        counts: list[int] = []
-        durations: list[int] = []
-        for f_min, f_max in bin_iterator:
-            counts.append(event_timeline.getNumberOfEvent(f_min, f_max))
-            durations.append(
-                event_timeline.getTotalDurationEvent(f_min, f_max)
-            )
+        event_frames = self._load_event_frames(
+            animals, events, bin_iterator[0][0], bin_iterator[-1][1]
+        )
+
+        results = []
+        for animal_events in event_frames:
+            results.append({})
+            for event, (starts, ends) in animal_events.items():
+                keep = ends - starts + 1 >= event_min_duration
+                results[-1][event] = self._bin_event_frames(
+                    starts[keep], ends[keep], bin_iterator
+                )
+
+        return results
+
+    @staticmethod
+    def _merge_event_frames(
+        starts: np.ndarray, ends: np.ndarray
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Merge overlapping or contiguous events. Returns the sorted start
+        and end frames of the merged events."""
+        valid = ends >= starts
+        order = np.argsort(starts[valid], kind="stable")
+        starts = starts[valid][order]
+        ends = ends[valid][order]
+        if len(starts) == 0:
+            return starts, ends
+
+        running_ends = np.maximum.accumulate(ends)
+        new_event = np.empty(len(starts), dtype=bool)
+        new_event[0] = True
+        new_event[1:] = starts[1:] > running_ends[:-1] + 1
+        first_index = np.flatnonzero(new_event)
+        last_index = np.append(first_index[1:] - 1, len(starts) - 1)
+
+        return starts[first_index], running_ends[last_index]
+
+    @staticmethod
+    def _bin_event_frames(
+        starts: np.ndarray,
+        ends: np.ndarray,
+        bin_iterator: list[tuple[int, int]],
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Count events (given by their sorted start and end frames) and
+        their duration (in frames) in each bin. An event overlapping several
+        bins is counted in each of them."""
+        bins = np.array(bin_iterator, dtype=np.int64).reshape(-1, 2)
+        f_min = bins[:, 0]
+        f_max = bins[:, 1]
+
+        nb_bins = len(bins)
+
+        # number of event frames lower or equal to each bin edge, with the
+        # edges just before each bin first and the bins last frames after
+        edges = np.concatenate((f_min - 1, f_max))
+        nb_started = np.searchsorted(starts, edges, side="right")
+        nb_ended = np.searchsorted(ends, edges, side="left")
+        starts_cumsum = np.concatenate(([0], np.cumsum(starts)))
+        ends_cumsum = np.concatenate(([0], np.cumsum(ends)))
+        covered_frames = (
+            nb_started * (edges + 1)
+            - starts_cumsum[nb_started]
+            - (nb_ended * edges - ends_cumsum[nb_ended])
+        )
+        durations = covered_frames[nb_bins:] - covered_frames[:nb_bins]
+
+        # events overlapping [f_min, f_max] are those starting before f_max
+        # minus those already ended before f_min
+        counts = nb_started[nb_bins:] - np.searchsorted(
+            ends, f_min, side="left"
+        )
 
         return (counts, durations)
 
+    def count_event_per_bin(
+        self,
+        animal: Animal,
+        event: str,
+        event_min_duration: int = 0,
+        bin_iterator: list[tuple[int, int]] | None = None,
+    ):
+        """Count occurrences of a specific event according to binning. An
+        event overlapping several bins is counted in each of them.
+
+        Returns
+        -------
+        tuple of two arrays (counts, durations)
+            counts : np.ndarray of int
+                Number of occurrences of the event in each bin.
+            durations : np.ndarray of int
+                Total duration (in frames) of the event in each bin.
+        """
+        return self._events_per_bin_bulk(
+            [animal], [event], event_min_duration, bin_iterator
+        )[0][event]
+
     def get_df_event_with_iterator(
         self,
         event: str,
@@ -207,73 +695,151 @@ class DataframeConstructor:
         if bin_iterator is None:
             bin_iterator = self.binner.get_bin_iterator()
 
-        results = []
-        for animal in self.animal_pool.getAnimalList():
-            print(
-                f"Creating EVENT dataframe ({event}) "
-                f"for animal {animal.RFID}"
-            )
+        start_times, end_times = self.binner.get_bin_times(bin_iterator)
 
-            counts, durations = self.count_event_per_bin(
-                animal,
-                event,
-                event_min_duration,
-                bin_iterator,
-            )
+        events_per_bin = self._events_per_bin_bulk(
+            self._animals, [event], event_min_duration, bin_iterator
+        )
 
-            for i, bin_i in enumerate(bin_iterator):
-                results.append(
-                    {
-                        "RFID": animal.RFID,
-                        "ANIMALID": animal.baseId,
-                        "EVENT": event,
-                        "START_FRAME": bin_i[0],
-                        "END_FRAME": bin_i[1],
-                        "START_TIME": self.binner.frame_to_time(bin_i[0]),
-                        "END_TIME": self.binner.frame_to_time(bin_i[1]),
-                        "EVENT_COUNT": counts[i],
-                        "FRAME_COUNT": durations[i],
-                        "DURATION": durations[i] / self.binner.fps / 60,  # min
-                    }
-                )
+        logger.debug("Creating EVENT dataframe (%s)", event)
 
-        df = pd.DataFrame(results)
+        nb_bins = len(bin_iterator)
+        nb_animals = len(self._animals)
+        bin_frames = np.asarray(bin_iterator, dtype=np.int64).reshape(-1, 2)
+        counts = np.concatenate(
+            [animal_events[event][0] for animal_events in events_per_bin]
+            or [np.array([], dtype=np.int64)]
+        )
+        durations = np.concatenate(
+            [animal_events[event][1] for animal_events in events_per_bin]
+            or [np.array([], dtype=np.int64)]
+        )
+
+        df = pd.DataFrame(
+            {
+                "RFID": self._rfid_column(nb_bins),
+                "ANIMALID": np.repeat(self._animal_ids, nb_bins),
+                "EVENT": pd.Categorical.from_codes(
+                    np.zeros(nb_animals * nb_bins, dtype=np.int8), [event]
+                ),
+                "START_FRAME": np.tile(bin_frames[:, 0], nb_animals),
+                "END_FRAME": np.tile(bin_frames[:, 1], nb_animals),
+                "START_TIME": np.tile(start_times, nb_animals),
+                "END_TIME": np.tile(end_times, nb_animals),
+                # counts are small non-negative integers
+                "EVENT_COUNT": counts.astype(np.uint32),
+                "FRAME_COUNT": durations.astype(np.uint32),
+                "DURATION": durations / self.binner.fps / 60,  # min
+            }
+        )
         return df
 
-    def get_df_event(self, event: str, event_min_duration: int = 0):
+    def get_df_event(
+        self,
+        event: str,
+        event_min_duration: int = 0,
+        output_path: Path | None = None,
+    ):
         """Process data between start and end frames to get a DataFrame
         containing the specified event counts and durations. It will process
         the whole dataset using the process window.
 
         All events shorter or with an equal duration to `event_min_duration`
         (in frames) will be ignored in the analysis.
+
+        If `output_path` is provided, each processed chunk is written to this
+        parquet file instead of being kept in memory, and the path is
+        returned instead of the DataFrame.
+
+        DataFrames kept in memory are memoized by event and binning, so that
+        asking twice for the same event does not process it again.
         """
 
+        key = (event, event_min_duration, self._binning_key())
+        if output_path is None and key in self._event_df_cache:
+            cached_df = self._event_df_cache[key]
+            if cached_df is None:
+                return None
+            return cached_df.copy(deep=False)
+
         split_iterator = self.binner.split_iterator_in_chunks(
             self.processing_window, self.binner.get_bin_iterator()
         )
-        df = None
+        chunks: list[pd.DataFrame] = []
+        writer = None
+
+        for processed_df in self._process_chunks(
+            "get_df_event_with_iterator",
+            split_iterator,
+            f"EVENT processing ({event})",
+            event=event,
+            event_min_duration=event_min_duration,
+        ):
+            if output_path is not None:
+                writer = self._write_parquet_chunk(
+                    writer, output_path, processed_df
+                )
+            elif processed_df is not None:
+                chunks.append(processed_df)
 
-        for bin_iterator in split_iterator:
-            print(
-                f"EVENT processing ({event}) for frames {bin_iterator[0][0]} "
-                f"to {bin_iterator[-1][1]}"
-            )
-            processed_df = self.get_df_event_with_iterator(
+        if writer is not None:
+            writer.close()
+            return output_path
+
+        if not chunks:
+            logger.warning("Unable to create the event dataframe")
+            self._event_df_cache[key] = None
+            return None
+
+        df = pd.concat(chunks, ignore_index=True)
+        self._event_df_cache[key] = self._rechunk(df)
+        return df.copy(deep=False)
+
+    def get_df_event_histogram_with_iterator(
+        self,
+        event: str,
+        event_min_duration: int = 0,
+        bin_iterator: list[tuple[int, int]] | None = None,
+    ):
+        """Get a DataFrame containing the count of events per duration (in
+        *frames*) for the specified event and bin_iterator.
+        """
+        if bin_iterator is None:
+            bin_iterator = self.binner.get_bin_iterator()
+
+        event_frames = self._load_event_frames(
+            self._animals, [event], bin_iterator[0][0], bin_iterator[-1][1]
+        )
+
+        results = []
+        for animal_events, rfid, animal_id in zip(
+            event_frames, self._animal_rfids, self._animal_ids
+        ):
+            logger.debug(
+                "Creating HISTOGRAM dataframe (%s) for animal %s",
                 event,
-                event_min_duration,
-                bin_iterator,
+                rfid,
+            )
+            starts, ends = animal_events[event]
+            lengths = ends - starts + 1
+            lengths, counts = np.unique(
+                lengths[lengths >= event_min_duration], return_counts=True
             )
-            if df is None:
-                df = processed_df
-            else:
-                df = pd.concat([df, processed_df], ignore_index=True)
 
-        if df is None:
-            print("Unable to create the event dataframe")
-            return None
+            results.append(
+                pd.DataFrame(
+                    {
+                        "NBFRAMES": lengths,
+                        "COUNT": counts,
+                        "RFID": rfid,
+                        "ANIMALID": animal_id,
+                    }
+                )
+            )
 
-        return df
+        if not results:
+            return None
+        return pd.concat(results, ignore_index=True)
 
     def get_df_event_histogram(self, event: str, event_min_duration: int = 0):
         """Get a DataFrame containing the histogram data of event duration (in
@@ -287,53 +853,119 @@ class DataframeConstructor:
             self.processing_window, self.binner.get_bin_iterator()
         )
 
-        df = None
-        for bin_iterator in split_iterator:
-            print(
-                f"HISTOGRAM processing ({event}) for frames "
-                f"{bin_iterator[0][0]} to {bin_iterator[-1][1]}"
-            )
-            for animal in self.animal_pool.getAnimalList():
-                print(
-                    f"Creating HISTOGRAM dataframe ({event}) "
-                    f"for animal {animal.RFID}"
-                )
-                event_timeline = EventTimeLine(
-                    self.animal_pool.conn,
-                    event,
-                    idA=animal.baseId,
-                    minFrame=bin_iterator[0][0],
-                    maxFrame=bin_iterator[-1][1],
-                )
-                event_timeline.removeEventsBelowLength(
-                    maxLen=event_min_duration
-                )
-
-                processed_df = (
-                    pd.DataFrame(
-                        {"NBFRAMES": event_timeline.getEventLengthList()}
-                    )
-                    .groupby("NBFRAMES")
-                    .size()
-                    .reset_index(name="COUNT")
-                )
-                processed_df["RFID"] = animal.RFID
-                processed_df["ANIMALID"] = animal.baseId
-
-                if df is None:
-                    df = processed_df
-                else:
-                    df = pd.concat([df, processed_df], ignore_index=True)
-
-        if df is None:
-            print("Unable to create the histogram dataframe")
+        chunks: list[pd.DataFrame] = []
+        for processed_df in self._process_chunks(
+            "get_df_event_histogram_with_iterator",
+            split_iterator,
+            f"HISTOGRAM processing ({event})",
+            event=event,
+            event_min_duration=event_min_duration,
+        ):
+            if processed_df is not None:
+                chunks.append(processed_df)
+
+        if not chunks:
+            logger.warning("Unable to create the histogram dataframe")
             return None
 
+        df = pd.concat(chunks, ignore_index=True)
+
         df = df.groupby(["RFID", "ANIMALID", "NBFRAMES"], as_index=False).agg(
             {"COUNT": "sum"}
         )
 
-        return df
+        return self._set_rfid_category(df)
+
+    @staticmethod
+    def get_distance_and_speed_per_bin(
+        frames: np.ndarray,
+        x: np.ndarray,
+        y: np.ndarray,
+        bin_iterator: list[tuple[int, int]],
+        filter_frames: tuple[np.ndarray, np.ndarray] | None,
+        scale_factor: float,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Compute the distance traveled (in cm) and the speeds statistics
+        (mean, min, max, sum, std, sem in cm/s) for each bin, from the
+        detected frames and mass positions (in *pixels*) of an animal. It
+        gives the same results as `Animal.getDistancePerBin` and
+        `Animal.getSpeedPerBin`, in a single vectorized pass.
+
+        The move between frames t and t+1 is counted in the bin containing
+        t, except for the last frame of the bin. If `filter_frames` (sorted
+        start and end frames of merged events) is given, the moves starting
+        on the second and following frames of these events are ignored.
+
+        Returns
+        -------
+        tuple of two arrays
+            distances : np.ndarray of shape (nb_bins,)
+            speeds : np.ndarray of shape (nb_bins, 6), NaN for empty bins
+        """
+        if np.any(frames[1:] < frames[:-1]):
+            order = np.argsort(frames, kind="stable")
+            frames, x, y = frames[order], x[order], y[order]
+
+        # moves between two successive detected frames, starting at frame t
+        successive = frames[1:] == frames[:-1] + 1
+        t = frames[:-1][successive]
+        moves = np.hypot(np.diff(x)[successive], np.diff(y)[successive])
+
+        bins = np.array(bin_iterator, dtype=np.int64).reshape(-1, 2)
+        bin_index = np.searchsorted(bins[:, 0], t, side="right") - 1
+        valid = bin_index >= 0
+        valid[valid] = t[valid] < bins[bin_index[valid], 1]
+
+        if filter_frames is not None:
+            starts, ends = filter_frames
+
+            def is_filtered(frame: np.ndarray) -> np.ndarray:
+                index = np.searchsorted(starts, frame, side="right") - 1
+                inside = index >= 0
+                inside[inside] = frame[inside] <= ends[index[inside]]
+                return inside
+
+            # the first filtered frame of each bin is still counted
+            valid &= ~(
+                is_filtered(t)
+                & is_filtered(t - 1)
+                & (t != bins[np.maximum(bin_index, 0), 0])
+            )
+
+        t, bin_index, moves = t[valid], bin_index[valid], moves[valid]
+        nb_bins = len(bins)
+
+        # discard if distance between 2 frames is too large
+        # 85.5 pixels = 15.0 cm
+        kept = moves <= 85.5
+        distances = (
+            np.bincount(
+                bin_index[kept], weights=moves[kept], minlength=nb_bins
+            )
+            * scale_factor
+        )
+
+        speeds = np.full((nb_bins, 6), np.nan)
+        values = moves * 30 * scale_factor
+        n = np.bincount(bin_index, minlength=nb_bins)
+        filled = n > 0
+        if filled.any():
+            starts_index = np.concatenate(([0], np.cumsum(n)[:-1]))[filled]
+            n = n[filled]
+            sums = np.add.reduceat(values, starts_index)
+            means = sums / n
+            deviations = values - np.repeat(means, n)
+            stds = np.sqrt(
+                np.add.reduceat(deviations * deviations, starts_index) / n
+            )
+            speeds[filled, 0] = means
+            speeds[filled, 1] = np.minimum.reduceat(values, starts_index)
+            speeds[filled, 2] = np.maximum.reduceat(values, starts_index)
+            speeds[filled, 3] = sums
+            speeds[filled, 4] = stds
+            speeds[filled, 5] = stds / np.sqrt(n)
+
+        return distances, speeds
 
     def get_df_activity_with_iterator(
         self,
@@ -351,225 +983,325 @@ class DataframeConstructor:
         if bin_iterator is None:
             bin_iterator = self.binner.get_bin_iterator()
 
-        self.animal_pool.loadDetection(
-            start=bin_iterator[0][0],
-            end=bin_iterator[-1][1],
-            lightLoad=True,
+        detections = self._load_detection(
+            bin_iterator[0][0], bin_iterator[-1][1]
         )
 
-        if self.analysis_area is not None:
-            self.animal_pool.filterDetectionByArea(*self.analysis_area)
-
-        results = []
-        for animal in self.animal_pool.getAnimalList():
-            print(f"Creating ACTIVITY dataframe for animal {animal.RFID}")
-
-            stop_counts, stop_durations = self.count_event_per_bin(
-                animal, "Stop", 0, bin_iterator
-            )
-
-            move_iso_counts, move_iso_durations = self.count_event_per_bin(
-                animal, "Move isolated", 0, bin_iterator
-            )
+        start_times, end_times = self.binner.get_bin_times(bin_iterator)
+        bin_frames = np.asarray(bin_iterator, dtype=np.int64)
+        bin_lengths = bin_frames[:, 1] - bin_frames[:, 0]
+        minutes_per_frame = 1.0 / (self.binner.fps * 60)
+
+        filter_events = []
+        if filter_flickering:
+            filter_events.append("Flickering")
+        if filter_stop:
+            filter_events.append("Stop")
+
+        # all events of the chunk in one query, from the frame before the
+        # first bin (needed by the filters, it does not change the bins)
+        activity_events = ["Stop", "Move isolated", "Move in contact"]
+        event_frames = self._load_event_frames(
+            self._animals,
+            list(dict.fromkeys(activity_events + filter_events)),
+            bin_iterator[0][0] - 1,
+            bin_iterator[-1][1],
+        )
 
-            move_inc_counts, move_inc_durations = self.count_event_per_bin(
-                animal, "Move in contact", 0, bin_iterator
+        columns: dict[str, list[np.ndarray]] = {}
+        for animal, (frames, x, y), animal_events, rfid in zip(
+            self._animals,
+            detections,
+            event_frames,
+            self._animal_rfids,
+        ):
+            logger.debug("Creating ACTIVITY dataframe for animal %s", rfid)
+
+            stop_counts, stop_durations = self._bin_event_frames(
+                *animal_events["Stop"], bin_iterator
             )
-
-            distances = animal.getDistancePerBin(
-                binIterator=bin_iterator,
-                filter_flickering=filter_flickering,
-                filter_stop=filter_stop,
+            move_iso_counts, move_iso_durations = self._bin_event_frames(
+                *animal_events["Move isolated"], bin_iterator
             )
-            speeds = animal.getSpeedPerBin(
-                binIterator=bin_iterator,
-                filter_flickering=filter_flickering,
-                filter_stop=filter_stop,
+            move_inc_counts, move_inc_durations = self._bin_event_frames(
+                *animal_events["Move in contact"], bin_iterator
             )
 
-            for i in range(len(bin_iterator)):
-                results.append(
-                    {
-                        "RFID": animal.RFID,
-                        "ANIMALID": animal.baseId,
-                        "START_FRAME": bin_iterator[i][0],
-                        "END_FRAME": bin_iterator[i][1],
-                        "START_TIME": self.binner.frame_to_time(
-                            bin_iterator[i][0],
-                        ),
-                        "END_TIME": self.binner.frame_to_time(
-                            bin_iterator[i][1],
-                        ),
-                        "DISTANCE": distances[i],
-                        "SPEED_MEAN": speeds[i][0],
-                        "SPEED_MIN": speeds[i][1],
-                        "SPEED_MAX": speeds[i][2],
-                        "SPEED_SUM": speeds[i][3],
-                        "SPEED_STD": speeds[i][4],
-                        "SPEED_SEM": speeds[i][5],
-                        "STOP_COUNT": stop_counts[i],
-                        "STOP_DURATION": stop_durations[i]
-                        / self.binner.fps
-                        / 60,  # in minutes
-                        "MOVE_COUNT": move_iso_counts[i] + move_inc_counts[i],
-                        "MOVE_DURATION": (
-                            move_iso_durations[i] + move_inc_durations[i]
-                        )
-                        / self.binner.fps
-                        / 60,  # in minutes
-                        "UNDETECTED_DURATION": (
-                            bin_iterator[i][1]
-                            - bin_iterator[i][0]
-                            - stop_durations[i]
-                            - (move_iso_durations[i] + move_inc_durations[i])
-                        )
-                        / self.binner.fps
-                        / 60,  # in minutes
-                    }
+            animal_filter_frames = None
+            if filter_events:
+                animal_filter_frames = self._merge_event_frames(
+                    np.concatenate(
+                        [animal_events[e][0] for e in filter_events]
+                    ),
+                    np.concatenate(
+                        [animal_events[e][1] for e in filter_events]
+                    ),
                 )
 
-        df = pd.DataFrame(results)
+            distances, speeds = self.get_distance_and_speed_per_bin(
+                frames,
+                x,
+                y,
+                bin_iterator,
+                animal_filter_frames,
+                animal.parameters.scaleFactor,
+            )
+
+            move_counts = move_iso_counts + move_inc_counts
+            move_durations = move_iso_durations + move_inc_durations
+            stop_minutes = stop_durations * minutes_per_frame
+            move_minutes = move_durations * minutes_per_frame
+            undetected_minutes = (
+                bin_lengths - stop_durations - move_durations
+            ) * minutes_per_frame
+
+            animal_columns = {
+                "DISTANCE": distances,
+                "SPEED_MEAN": speeds[:, 0],
+                "SPEED_MIN": speeds[:, 1],
+                "SPEED_MAX": speeds[:, 2],
+                "SPEED_SUM": speeds[:, 3],
+                "SPEED_STD": speeds[:, 4],
+                "SPEED_SEM": speeds[:, 5],
+                "STOP_COUNT": stop_counts,
+                "STOP_DURATION": stop_minutes,
+                "MOVE_COUNT": move_counts,
+                "MOVE_DURATION": move_minutes,
+                "UNDETECTED_DURATION": undetected_minutes,
+            }
+            for key, values in animal_columns.items():
+                columns.setdefault(key, []).append(values)
+
+        nb_bins = len(bin_iterator)
+        nb_animals = len(self._animals)
+        df = pd.DataFrame(
+            {
+                "RFID": self._rfid_column(nb_bins),
+                "ANIMALID": np.repeat(self._animal_ids, nb_bins),
+                "START_FRAME": np.tile(bin_frames[:, 0], nb_animals),
+                "END_FRAME": np.tile(bin_frames[:, 1], nb_animals),
+                "START_TIME": np.tile(start_times, nb_animals),
+                "END_TIME": np.tile(end_times, nb_animals),
+                **{
+                    key: np.concatenate(values)
+                    for key, values in columns.items()
+                },
+            }
+        )
         return df
 
     def get_df_activity(
         self,
         filter_flickering: bool = False,
         filter_stop: bool = False,
+        output_path: Path | None = None,
     ):
         """Process data between start and end frames to get a DataFrame
         containing activity data. It will process the whole dataset using
         the process window.
+
+        If `output_path` is provided, each processed chunk is written to this
+        parquet file instead of being kept in memory, and the path is
+        returned instead of the DataFrame.
         """
         split_iterator = self.binner.split_iterator_in_chunks(
             self.processing_window, self.binner.get_bin_iterator()
         )
-        df = None
+        chunks: list[pd.DataFrame] = []
+        writer = None
+
+        for processed_df in self._process_chunks(
+            "get_df_activity_with_iterator",
+            split_iterator,
+            "ACTIVITY processing",
+            filter_flickering=filter_flickering,
+            filter_stop=filter_stop,
+        ):
+            if output_path is not None:
+                writer = self._write_parquet_chunk(
+                    writer, output_path, processed_df
+                )
+            elif processed_df is not None:
+                chunks.append(processed_df)
 
-        for bin_iterator in split_iterator:
-            print(
-                f"ACTIVITY processing for frames {bin_iterator[0][0]} to "
-                f"{bin_iterator[-1][1]}"
-            )
-            processed_df = self.get_df_activity_with_iterator(
-                bin_iterator, filter_flickering, filter_stop
-            )
-            if df is None:
-                df = processed_df
-            else:
-                df = pd.concat([df, processed_df], ignore_index=True)
+        if writer is not None:
+            writer.close()
+            return output_path
 
-        if df is None:
-            print("Unable to create the activity dataframe")
+        if not chunks:
+            logger.warning("Unable to create the activity dataframe")
             return None
 
+        df = pd.concat(chunks, ignore_index=True)
+        return self._rechunk(df)
+
+    def get_df_trajectory_with_iterator(
+        self, bin_iterator: list[tuple[int, int]] | None = None
+    ):
+        """Get a DataFrame containing trajectory data (in cm) for all animals
+        between the first and last frames of bin_iterator.
+        """
+        if bin_iterator is None:
+            bin_iterator = self.binner.get_bin_iterator()
+
+        self._set_detection_dictionaries(
+            self._load_detection(bin_iterator[0][0], bin_iterator[-1][1])
+        )
+
+        results = []
+        for animal, rfid, animal_id in zip(
+            self._animals, self._animal_rfids, self._animal_ids
+        ):
+            logger.debug("Creating TRAJECTORY dataframe for animal %s", rfid)
+
+            xList, yList, fList = animal.get_trajectory()
+
+            for i in range(len(xList)):
+                if np.isnan(xList[i]).any() or np.isnan(yList[i]).any():
+                    continue
+                results.append(
+                    {
+                        "RFID": rfid,
+                        "ANIMALID": animal_id,
+                        "FRAME": fList[i],
+                        "X": np.mean(xList[i]) * animal.parameters.scaleFactor,
+                        "Y": np.mean(yList[i]) * animal.parameters.scaleFactor,
+                    }
+                )
+
+        df = self._set_rfid_category(pd.DataFrame(results))
+        if not df.empty:
+            df["TIME"] = self.binner.frames_to_datetime64(df["FRAME"])
         return df
 
-    def get_df_trajectory(self) -> pd.DataFrame | None:
+    def get_df_trajectory(
+        self, output_path: Path | None = None
+    ) -> pd.DataFrame | Path | None:
         """Get a DataFrame containing trajectory data for all animals.
         (distance are in cm)
+
+        If `output_path` is provided, each processed chunk is written to this
+        parquet file instead of being kept in memory, and the path is
+        returned instead of the DataFrame.
         """
 
         split_iterator = self.binner.split_iterator_in_chunks(
             self.processing_window, self.binner.get_bin_iterator()
         )
-        df = None
-
-        for bin_iterator in split_iterator:
-            print(
-                f"TRAJECTORY processing for frames {bin_iterator[0][0]} to "
-                f"{bin_iterator[-1][1]}"
-            )
-            self.animal_pool.loadDetection(
-                start=bin_iterator[0][0],
-                end=bin_iterator[-1][1],
-                lightLoad=True,
-            )
-            if self.analysis_area is not None:
-                self.animal_pool.filterDetectionByArea(*self.analysis_area)
-            results = []
-            for animal in self.animal_pool.getAnimalList():
-                print(
-                    f"Creating TRAJECTORY dataframe for animal {animal.RFID}"
+        chunks: list[pd.DataFrame] = []
+        writer = None
+
+        for processed_df in self._process_chunks(
+            "get_df_trajectory_with_iterator",
+            split_iterator,
+            "TRAJECTORY processing",
+        ):
+            if output_path is not None:
+                writer = self._write_parquet_chunk(
+                    writer, output_path, processed_df
                 )
+            elif processed_df is not None:
+                chunks.append(processed_df)
 
-                xList, yList, fList = animal.get_trajectory()
-
-                for i in range(len(xList)):
-                    if np.isnan(xList[i]).any() or np.isnan(yList[i]).any():
-                        continue
-                    results.append(
-                        {
-                            "RFID": animal.RFID,
-                            "ANIMALID": animal.baseId,
-                            "FRAME": fList[i],
-                            "X": np.mean(xList[i])
-                            * animal.parameters.scaleFactor,
-                            "Y": np.mean(yList[i])
-                            * animal.parameters.scaleFactor,
-                            "TIME": self.binner.frame_to_time(fList[i]),
-                        }
-                    )
+        if writer is not None:
+            writer.close()
+            return output_path
 
-            processed_df = pd.DataFrame(results)
+        if not chunks:
+            logger.warning("Unable to create the trajectory dataframe")
+            return None
 
-            if df is None:
-                df = processed_df
-            else:
-                df = pd.concat([df, processed_df], ignore_index=True)
+        df = pd.concat(chunks, ignore_index=True)
+        return self._rechunk(df)
 
-        if df is None:
-            print("Unable to create the activity dataframe")
-            return None
+    @staticmethod
+    def _reduce_per_bin(
+        frame_values: np.ndarray,
+        values: np.ndarray,
+        bin_iterator: list[tuple[int, int]],
+    ) -> dict[str, np.ndarray]:
+        """Get mean, min, max, std and sem of each column of `values` (2D
+        array, one row per frame) for each bin of bin_iterator, all columns
+        being reduced together. `frame_values` must be sorted in ascending
+        order.
+
+        A bin holds the frames after the end frame of the previous bin, up to
+        and including its own end frame (the first bin also holds the frames
+        before its end). Earlier versions also counted in a bin the first
+        sample after its end frame, taken from the next bin, so their
+        statistics differ slightly.
+
+        Returns a dict of 2D arrays (bins x columns), one per statistic. If
+        no data in a bin, fills with np.nan.
+        """
+        bin_ends = np.searchsorted(
+            frame_values, [f_max for _, f_max in bin_iterator], side="right"
+        )
+        bin_starts = np.concatenate(([0], bin_ends[:-1]))
+        counts = bin_ends - bin_starts
+        filled = counts > 0
+
+        shape = (len(bin_iterator), values.shape[1])
+        stats = {
+            stat: np.full(shape, np.nan)
+            for stat in ["MEAN", "MIN", "MAX", "STD", "SEM"]
+        }
+
+        if filled.any():
+            # empty bins have a null length so the reduction of each filled
+            # bin stops at the start of the next filled one
+            values = values[: bin_ends[-1]]
+            starts = bin_starts[filled]
+            n = counts[filled][:, np.newaxis]
+
+            means = np.add.reduceat(values, starts, axis=0) / n
+            deviations = values - np.repeat(means, n[:, 0], axis=0)
+            stds = np.sqrt(
+                np.add.reduceat(deviations * deviations, starts, axis=0) / n
+            )
+            stats["MEAN"][filled] = means
+            stats["MIN"][filled] = np.minimum.reduceat(values, starts, axis=0)
+            stats["MAX"][filled] = np.maximum.reduceat(values, starts, axis=0)
+            stats["STD"][filled] = stds
+            stats["SEM"][filled] = stds / np.sqrt(n)
 
-        return df
+        return stats
 
     def calculate_sensors_statistics(
         self,
         sensor_name: str,
-        frame_values: list[int],
-        sensor_values: list[float],
+        frame_values: np.ndarray,
+        sensor_values: np.ndarray,
         bin_iterator: list[tuple[int, int]],
     ):
-        """Get sensors data (mean, min, max, std, sem) for a bin bordered by
-        bin_start_frame and bin_end_frame.
+        """Get sensors data (mean, min, max, std, sem) for each bin of
+        bin_iterator. `frame_values` must be sorted in ascending order.
 
-        Returns a list of dicts, one per bin, always matching the number of bins.
-        If no data in a bin, fills with np.nan.
+        Returns a dict of arrays (one per statistic), each always matching the
+        number of bins. If no data in a bin, fills with np.nan.
         """
+        stats = self._reduce_per_bin(
+            np.asarray(frame_values),
+            np.asarray(sensor_values, dtype=np.float64)[:, np.newaxis],
+            bin_iterator,
+        )
+        return {
+            f"{sensor_name}_{stat}": values[:, 0]
+            for stat, values in stats.items()
+        }
 
-        results: list[dict[str, float]] = []
-        i_min = 0
-        i_max = 0
-        for _, f_max in bin_iterator:
-            while frame_values[i_max] < f_max:
-                i_max += 1
-            arr = np.array(sensor_values[i_min : i_max + 1])
-            i_min = i_max + 1
-            results.append(
-                {
-                    f"{sensor_name}_MEAN": float(arr.mean()),
-                    f"{sensor_name}_MIN": float(arr.min()),
-                    f"{sensor_name}_MAX": float(arr.max()),
-                    f"{sensor_name}_STD": (
-                        float(arr.std()) if len(arr) > 1 else 0.0
-                    ),
-                    f"{sensor_name}_SEM": (
-                        float(arr.std() / np.sqrt(len(arr)))
-                        if len(arr) > 1
-                        else 0.0
-                    ),
-                }
-            )
-        return results
-
-    def get_df_sensors_with_iterator(
-        self, bin_iterator: list[tuple[int, int]] | None = None
-    ):
-
-        if bin_iterator is None:
-            bin_iterator = self.binner.get_bin_iterator()
+    def get_sensors_query(self) -> tuple[str | None, list[str]]:
+        """Get the parameterized SQL query selecting the available sensors
+        in the FRAME table, along with the list of these sensors. The FRAME
+        table is only inspected on the first call, the same statement is then
+        reused for every chunk.
 
-        query_limits = f" WHERE FRAMENUMBER >= {bin_iterator[0][0]} AND FRAMENUMBER <= {bin_iterator[-1][1]}"
+        Returns:
+            tuple: The query (None if no sensor is available) and the list of
+                available sensors.
+        """
+        if self._sensors_sql is not None:
+            return self._sensors_sql, self._available_sensors
 
         sensors = [
             "TEMPERATURE",
@@ -579,78 +1311,190 @@ class DataframeConstructor:
             "LIGHTVISIBLEANDIR",
         ]
 
-        cursor = self.animal_pool.conn.cursor()
-        cursor.execute(f"SELECT FRAMENUMBER FROM FRAME" + query_limits)
-        frame_rows = cursor.fetchall()
-        cursor.close()
-        frames = [row[0] for row in frame_rows]
+        connection = self.animal_pool.conn
+        table_info = connection.execute("PRAGMA table_info(FRAME)").fetchall()
+        frame_columns = {row[1] for row in table_info}
+        framenumber_indexed = any(
+            row[1] == "FRAMENUMBER" and row[5] > 0 for row in table_info
+        )
+        for index in connection.execute("PRAGMA index_list(FRAME)").fetchall():
+            index_columns = [
+                row[2]
+                for row in connection.execute(
+                    f"PRAGMA index_info('{index[1]}')"
+                )
+            ]
+            if index_columns and index_columns[0] == "FRAMENUMBER":
+                framenumber_indexed = True
+
+        if not framenumber_indexed:
+            logger.warning(
+                "FRAMENUMBER is not indexed in FRAME table => sensors "
+                "processing will scan the whole table for each chunk"
+            )
 
-        sensors_data: dict[str, list[dict[str, float]]] = {}
+        self._available_sensors = []
         for sensor in sensors:
-            print(f"Creating SENSOR dataframe ({sensor})")
-            try:
-                cursor = self.animal_pool.conn.cursor()
-                cursor.execute(f"SELECT {sensor} FROM FRAME" + query_limits)
-                values = [row[0] for row in cursor.fetchall()]
-                cursor.close()
-                sensors_data[sensor] = self.calculate_sensors_statistics(
-                    sensor, frames, values, bin_iterator
-                )
-            except:
-                print(f"Cannot access data for {sensor} => Skipping")
+            if sensor in frame_columns:
+                self._available_sensors.append(sensor)
+            else:
+                logger.warning("Cannot access data for %s => Skipping", sensor)
+
+        if not self._available_sensors:
+            return None, []
+
+        self._sensors_sql = (
+            f"SELECT FRAMENUMBER, {', '.join(self._available_sensors)} "
+            "FROM FRAME WHERE FRAMENUMBER BETWEEN ? AND ? "
+            "ORDER BY FRAMENUMBER"
+        )
+        return self._sensors_sql, self._available_sensors
+
+    def get_df_sensors_with_iterator(
+        self, bin_iterator: list[tuple[int, int]] | None = None
+    ):
+
+        if bin_iterator is None:
+            bin_iterator = self.binner.get_bin_iterator()
 
-        if not sensors_data.keys():
-            print("No sensor data available")
+        query, available_sensors = self.get_sensors_query()
+        if query is None:
+            logger.warning("No sensor data available")
             return None
-        else:
-            for sensor in sensors:
-                if sensor not in sensors_data:
-                    sensors.remove(sensor)
 
-        results: list[dict[str, Any]] = []
-        for i in range(len(bin_iterator)):
-            results.append(
-                {
-                    "START_FRAME": bin_iterator[i][0],
-                    "END_FRAME": bin_iterator[i][1],
-                    "START_TIME": self.binner.frame_to_time(
-                        bin_iterator[i][0]
-                    ),
-                    "END_TIME": self.binner.frame_to_time(bin_iterator[i][1]),
-                }
-            )
-            for sensor in sensors:
-                for key, value in sensors_data[sensor][i].items():
-                    results[-1][key] = value
+        df_frame = pd.read_sql_query(
+            query,
+            self.animal_pool.conn,
+            params=(bin_iterator[0][0], bin_iterator[-1][1]),
+            dtype={
+                "FRAMENUMBER": np.int64,
+                **{sensor: np.float64 for sensor in available_sensors},
+            },
+        )
+        frames = df_frame["FRAMENUMBER"].to_numpy()
 
-        df = pd.DataFrame(results)
+        logger.debug(
+            "Creating SENSOR dataframe (%s)", ", ".join(available_sensors)
+        )
+        stats = self._reduce_per_bin(
+            frames, df_frame[available_sensors].to_numpy(), bin_iterator
+        )
+        sensors_data: dict[str, dict[str, np.ndarray]] = {
+            sensor: {
+                f"{sensor}_{stat}": values[:, column]
+                for stat, values in stats.items()
+            }
+            for column, sensor in enumerate(available_sensors)
+        }
+
+        sensors = [s for s in available_sensors if s in sensors_data]
+        if not sensors:
+            logger.warning("No sensor data available")
+            return None
+
+        start_times, end_times = self.binner.get_bin_times(bin_iterator)
+        bin_frames = np.asarray(bin_iterator, dtype=np.int64).reshape(-1, 2)
+
+        df = pd.DataFrame(
+            {
+                "START_FRAME": bin_frames[:, 0],
+                "END_FRAME": bin_frames[:, 1],
+                "START_TIME": start_times,
+                "END_TIME": end_times,
+                **{
+                    key: values
+                    for sensor in sensors
+                    for key, values in sensors_data[sensor].items()
+                },
+            }
+        )
         return df
 
-    def get_df_sensors(self):
+    def get_df_sensors(self, output_path: Path | None = None):
         """Process data between start and end frames to get a DataFrame
         containing sensors data. It will process the whole dataset using
         the process window.
+
+        If `output_path` is provided, each processed chunk is written to this
+        parquet file instead of being kept in memory, and the path is
+        returned instead of the DataFrame.
+
+        DataFrames kept in memory are memoized by binning, so that asking
+        twice for the sensors does not process them again.
         """
+
+        key = self._binning_key()
+        if output_path is None and key in self._sensors_df_cache:
+            cached_df = self._sensors_df_cache[key]
+            if cached_df is None:
+                return None
+            return cached_df.copy(deep=False)
+
         split_iterator = self.binner.split_iterator_in_chunks(
             self.processing_window, self.binner.get_bin_iterator()
         )
-        df = None
+        chunks: list[pd.DataFrame] = []
+        writer = None
+
+        for processed_df in self._process_chunks(
+            "get_df_sensors_with_iterator",
+            split_iterator,
+            "SENSORS processing",
+        ):
+            if output_path is not None:
+                writer = self._write_parquet_chunk(
+                    writer, output_path, processed_df
+                )
+            elif processed_df is not None:
+                chunks.append(processed_df)
 
-        for bin_iterator in split_iterator:
-            print(
-                f"SENSORS processing for frames {bin_iterator[0][0]} to "
-                f"{bin_iterator[-1][1]}"
-            )
-            processed_df = self.get_df_sensors_with_iterator(
-                bin_iterator=bin_iterator
-            )
-            if df is None:
-                df = processed_df
-            else:
-                df = pd.concat([df, processed_df], ignore_index=True)
+        if writer is not None:
+            writer.close()
+            return output_path
 
-        if df is None:
-            print("Unable to create the sensors dataframe")
+        if not chunks:
+            logger.warning("Unable to create the sensors dataframe")
+            self._sensors_df_cache[key] = None
             return None
 
-        return df
+        df = pd.concat(chunks, ignore_index=True)
+        self._sensors_df_cache[key] = self._rechunk(df)
+        return df.copy(deep=False)
+
+
+_worker_constructors: dict[
+    tuple[str, tuple[int, int, int, int] | None, int], DataframeConstructor
+] = {}
+"""Constructors of a worker process, by (database_path, analysis_area, fps),
+kept for the next chunks processed by the same worker."""
+
+
+def _process_chunk(
+    database_path: str,
+    binner: Binner,
+    analysis_area: tuple[int, int, int, int] | None,
+    method_name: str,
+    bin_iterator: list[tuple[int, int]],
+    kwargs: dict[str, Any],
+):
+    """Process one chunk in a worker process, with the binning of the calling
+    `DataframeConstructor`. The first chunk of a worker opens a read-only
+    connection to the database and builds a new `DataframeConstructor` on
+    it, which is reused (animals, time reference, caches) by the following
+    chunks of the same worker."""
+    key = (database_path, analysis_area, binner.fps)
+    df_constructor = _worker_constructors.get(key)
+    if df_constructor is None:
+        # escaped path, as '#', '?' and '%' are special characters in a URI
+        database_uri = Path(database_path).as_uri() + "?mode=ro"
+        connection = sqlite3.connect(database_uri, uri=True)
+        df_constructor = DataframeConstructor(
+            connection,
+            analysis_area=analysis_area,
+            fps=binner.fps,
+        )
+        _worker_constructors[key] = df_constructor
+    df_constructor.binner = binner
+    return getattr(df_constructor, method_name)(
+        bin_iterator=bin_iterator, **kwargs
+    )
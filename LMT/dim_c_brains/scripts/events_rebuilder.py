@@ -3,20 +3,30 @@
 @author: xmousset
 """
 
+import os
 import sys
+import sqlite3
+import importlib
 import traceback
+from contextlib import contextmanager
+from time import perf_counter_ns
 from types import ModuleType
 from sqlite3 import Connection
 from typing import Callable, Literal
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
+import numpy as np
 import pandas as pd
 
 from dim_c_brains.scripts.binner import Binner
+from dim_c_brains.scripts.df_constructor import (
+    EVENT_NAME_INDEX,
+    READ_PRAGMAS,
+)
 from dim_c_brains.scripts.events_and_modules import get_modules
 
 from lmtanalysis.Animal import AnimalPool
 from lmtanalysis.AnimalType import AnimalType
-from lmtanalysis.Event import Chronometer
 from lmtanalysis.Measure import oneDay
 from lmtanalysis import BuildDataBaseIndex, CheckWrongAnimal
 from lmtanalysis.TaskLogger import TaskLogger
@@ -27,8 +37,42 @@ from lmtanalysis.EventTimeLineCache import (
 
 from psutil import virtual_memory
 
+WRITE_TIMEOUT = 3600
+"""Time (in *seconds*) a worker process waits for the database to be
+unlocked by the other workers before failing to write its events."""
+
+
+@contextmanager
+def _timer(label: str, verbose: bool = True):
+    """Print the time taken by the `with` block if `verbose` (nothing is
+    printed if the block raises)."""
+    start = perf_counter_ns()
+    yield
+    if verbose:
+        seconds = (perf_counter_ns() - start) / 1e9
+        print(f"[Chrono {label}] {seconds:.4f} seconds")
+
+
+class _DeferredCommitConnection:
+    """Connection given to the `flush` and `reBuildEvent` functions of the
+    modules. Modules commit after every deleted or saved event timeline;
+    commits are ignored here so that all their writes end up in a single
+    transaction, committed once by the caller."""
+
+    def __init__(self, connection: Connection):
+        self._connection = connection
+
+    def commit(self):
+        pass
+
+    def __getattr__(self, name: str):
+        return getattr(self._connection, name)
+
 
 class EventsRebuilder:
+    _memory_checked = False
+    """True once `check_memory` has run in this process."""
+
     def __init__(
         self,
         connection: Connection,
@@ -38,6 +82,8 @@ class EventsRebuilder:
         fps: int = 30,
         processing_window: int = oneDay,
         utc_offset: float = 0.0,
+        n_jobs: int = 1,
+        verbose: bool = False,
     ):
         """Class to handle the rebuilding of events in the database.
 
@@ -54,9 +100,26 @@ class EventsRebuilder:
                 Default is one day (in frames).
             utc_offset (float, optional): UTC offset in hours for correct
                 timezone conversion (e.g. *+9.0* for Tokyo). Defaults to *0.0*.
+            n_jobs (int, optional): Number of processes used to rebuild the
+                processing windows in parallel (*-1* to use all CPUs). Each
+                process loads the detections of its own window. Only used if
+                the connection is linked to a database file. Defaults to *1*
+                (no parallelization).
+            verbose (bool, optional): Whether to print the time taken to
+                flush the events and by each module in each window. Defaults
+                to *False*.
         """
         self.conn = connection
+        for pragma in READ_PRAGMAS:
+            self.conn.execute(f"PRAGMA {pragma}")
         self.animal_type = animal_type
+        self.n_jobs = n_jobs if n_jobs > 0 else (os.cpu_count() or 1)
+        self.verbose = verbose
+        self.database_path = None
+        """Path of the database file, None if the database is in memory."""
+        for _, name, file in connection.execute("PRAGMA database_list"):
+            if name == "main" and file:
+                self.database_path = file
 
         last_framenumber, last_timestamp = Binner.get_last_frame(self.conn)
         self.binner = Binner(
@@ -68,18 +131,42 @@ class EventsRebuilder:
             fps=fps,
             utc_offset=utc_offset,
         )
+        self._database_events: set[str] | None = None
+        """Names of the events in the database, read once by
+        `get_events_in_database` and reset after a rebuild."""
+
+        # distinct event names are then read from the index, without
+        # scanning the EVENT table (nothing is done if read-only)
+        try:
+            self.conn.execute(EVENT_NAME_INDEX)
+            self.conn.commit()
+        except sqlite3.OperationalError as error:
+            print(f"Event name index not created: {error}")
 
     def get_events_in_database(self) -> set[str]:
         """Get the list of existing events in the SQLite database."""
-        query = "SELECT DISTINCT NAME FROM EVENT ORDER BY NAME"
-
-        cursor = self.conn.cursor()
-        cursor.execute(query)
-        results = cursor.fetchall()
-        cursor.close()
+        if self._database_events is None:
+            query = "SELECT DISTINCT NAME FROM EVENT"
+            self._database_events = {
+                row[0] for row in self.conn.execute(query)
+            }
+        return set(self._database_events)
+
+    def get_missing_events(self, events: list[str] | set[str]) -> set[str]:
+        """Get the events of `events` that are not in the SQLite database.
+
+        Each name is looked up in the event name index, which stops at the
+        first matching row instead of listing all distinct names.
+        """
+        if self._database_events is not None:
+            return set(events) - self._database_events
 
-        database_events = set([row[0] for row in results])
-        return database_events
+        query = "SELECT 1 FROM EVENT WHERE NAME = ? LIMIT 1"
+        return {
+            event
+            for event in events
+            if self.conn.execute(query, (event,)).fetchone() is None
+        }
 
     def set_processing_window(self, processing_window: int):
         """Set the processing window (in *frames*) for processing."""
@@ -119,25 +206,69 @@ class EventsRebuilder:
 
     def check_memory(self):
         """Check available system memory and disable event caching if
-        necessary."""
-        mem = virtual_memory()
-        availableMemoryGB = mem.total / 1_000_000_000
-        print("Total memory on computer: (GB)", availableMemoryGB)
+        necessary. The check is only done once per process."""
+        if EventsRebuilder._memory_checked:
+            return
+        EventsRebuilder._memory_checked = True
+
+        available_gib = virtual_memory().available >> 30
+        print("Available memory on computer: (GiB)", available_gib)
 
-        if availableMemoryGB < 10:
+        if available_gib < 10:
             print("Not enough memory to use cache load of events.")
             disableEventTimeLineCache()
 
+    @staticmethod
+    def _get_detection_soa(
+        animal_pool: AnimalPool,
+    ) -> dict[int, tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """Get the loaded detections of each animal of the pool as contiguous
+        (frames, mass x, mass y) arrays, by animal id.
+
+        They are shared by the modules of a window (as `pool.xy_soa`), so that
+        modules only needing the mass positions work on arrays instead of
+        walking the detection dictionaries.
+        """
+        xy_soa = {}
+        for animal_id, animal in animal_pool.animalDictionary.items():
+            detections = animal.detectionDictionary
+            frames = np.fromiter(
+                detections.keys(), dtype=np.int64, count=len(detections)
+            )
+            # missing positions (None) become NaN
+            mass_x = np.array(
+                [detection.massX for detection in detections.values()],
+                dtype=np.float64,
+            )
+            mass_y = np.array(
+                [detection.massY for detection in detections.values()],
+                dtype=np.float64,
+            )
+            xy_soa[animal_id] = (frames, mass_x, mass_y)
+        return xy_soa
+
     def _rebuild_window(
         self,
-        modules: set[ModuleType],
+        modules: set[ModuleType] | list[ModuleType],
         window: tuple[int, int],
         progress_callback: Callable[[int, int], None] | None = None,
         window_progress: tuple[int, int] = (0, 1),
+        commit_each_module: bool = False,
+        animal_pool: AnimalPool | None = None,
     ):
         """Rebuild events in the specified time window using the specified
         modules.
 
+        The animals of `animal_pool` are reused if given (only the detections
+        of the window are loaded), so that the windows of a rebuild do not
+        read the ANIMAL table again.
+
+        All the events of the window are written in a single transaction,
+        rolled back if a module fails. If `commit_each_module` is True, the
+        transaction is committed after each module instead, so that the
+        database is not locked for the whole window (used when other
+        processes write in the database at the same time).
+
         If a progress_callback is provided, it will be called with progress
         messages (used for updating the UI in app). Otherwise, progress will be
         printed to the console.
@@ -149,12 +280,14 @@ class EventsRebuilder:
 
         CheckWrongAnimal.check(self.conn, window[0], window[1])
 
-        animalPool = None
         flushEventTimeLineCache()
         print("Caching load of animal detection...")
-        animalPool = AnimalPool()
-        animalPool.loadAnimals(self.conn)
+        if animal_pool is None:
+            animal_pool = AnimalPool()
+            animal_pool.loadAnimals(self.conn)
+        animalPool = animal_pool
         animalPool.loadDetection(start=window[0], end=window[1])
+        animalPool.xy_soa = self._get_detection_soa(animalPool)
         print("Caching load of animal detection done.")
 
         nb_modules = len(modules)
@@ -165,21 +298,63 @@ class EventsRebuilder:
         ]
         self.update_progression(*progression)
 
-        for i, build_event_module in enumerate(modules):
-
-            event_chrono = Chronometer(str(build_event_module))
-            build_event_module.reBuildEvent(
-                connection=self.conn,
-                file=None,
-                tmin=window[0],
-                tmax=window[1],
-                pool=animalPool,
-                animalType=self.animal_type,
-            )
-            event_chrono.printTimeInS()
+        module_connection = _DeferredCommitConnection(self.conn)
+        try:
+            for i, build_event_module in enumerate(modules):
+
+                with _timer(str(build_event_module), self.verbose):
+                    build_event_module.reBuildEvent(
+                        connection=module_connection,
+                        file=None,
+                        tmin=window[0],
+                        tmax=window[1],
+                        pool=animalPool,
+                        animalType=self.animal_type,
+                    )
+                    if commit_each_module:
+                        self.conn.commit()
+
+                progression[0] = i + 1 + nb_modules * window_progress[0]
+                self.update_progression(*progression)
+        except BaseException:
+            self.conn.rollback()
+            raise
+        self.conn.commit()
+
+    def _rebuild_windows_in_parallel(
+        self,
+        modules: set[ModuleType],
+        processing_windows: list[tuple[int, int]],
+        progress_callback: Callable[[int, int], None] | None = None,
+    ):
+        """Rebuild each processing window in a separate process, with its own
+        connection to the database.
 
-            progression[0] = i + 1 + nb_modules * window_progress[0]
-            self.update_progression(*progression)
+        Modules of a window may depend on the events built by the previous
+        ones, so they are still run in order inside each window. Windows only
+        read and write their own frames, so they are independent of each
+        other. Writes are serialized by the database lock.
+        """
+        module_names = [module.__name__ for module in modules]
+        nb_windows = len(processing_windows)
+        print(f"Rebuilding {nb_windows} windows with {self.n_jobs} processes")
+
+        with ProcessPoolExecutor(max_workers=self.n_jobs) as executor:
+            futures = [
+                executor.submit(
+                    _rebuild_window_worker,
+                    self.database_path,
+                    self.animal_type,
+                    module_names,
+                    window,
+                    (i, nb_windows),
+                    self.verbose,
+                )
+                for i, window in enumerate(processing_windows)
+            ]
+            for nb_done, future in enumerate(as_completed(futures), 1):
+                future.result()
+                self.update_progression(nb_done, nb_windows, progress_callback)
 
     def rebuild(
         self,
@@ -203,31 +378,46 @@ class EventsRebuilder:
         self.check_memory()
 
         # update missing fields
-        try:
-            cursor = self.conn.cursor()
-            query = "ALTER TABLE EVENT ADD METADATA TEXT"
-            cursor.execute(query)
+        columns = {
+            row[1] for row in self.conn.execute("PRAGMA table_info(EVENT)")
+        }
+        if "METADATA" not in columns:
+            self.conn.execute("ALTER TABLE EVENT ADD METADATA TEXT")
             self.conn.commit()
-        except:
+        else:
             print("METADATA field already exists")
 
         BuildDataBaseIndex.buildDataBaseIndex(self.conn, force=False)
 
         try:
-            chrono = Chronometer("Flushing events")
-            for module in modules:
-                module.flush(self.conn)
-            chrono.printTimeInS()
+            with _timer("Flushing events", self.verbose):
+                flush_connection = _DeferredCommitConnection(self.conn)
+                for module in modules:
+                    module.flush(flush_connection)
+                self.conn.commit()
 
             processing_windows = self.binner.get_bin_iterator()
             nb_windows = len(processing_windows)
-            for i, window in enumerate(processing_windows):
-                self._rebuild_window(
-                    modules,
-                    window,
-                    progress_callback,
-                    window_progress=(i, nb_windows),
+            if (
+                self.n_jobs > 1
+                and nb_windows > 1
+                and self.database_path is not None
+            ):
+                self._rebuild_windows_in_parallel(
+                    modules, processing_windows, progress_callback
                 )
+            else:
+                # animals are loaded once, detections for each window
+                animal_pool = AnimalPool()
+                animal_pool.loadAnimals(self.conn)
+                for i, window in enumerate(processing_windows):
+                    self._rebuild_window(
+                        modules,
+                        window,
+                        progress_callback,
+                        window_progress=(i, nb_windows),
+                        animal_pool=animal_pool,
+                    )
 
         except:
             exc_type, exc_value, exc_traceback = sys.exc_info()
@@ -243,6 +433,7 @@ class EventsRebuilder:
             print(error, file=sys.stderr)
             raise Exception()
 
+        self._database_events = None
         self.update_progression(1, 1, progress_callback)
         print("\n*** REBUILD FINISHED ***\n")
 
@@ -260,3 +451,27 @@ class EventsRebuilder:
                 f"Progress: {current_progression}/{max_progression} "
                 f"({(current_progression/max_progression)*100:.1f}%)"
             )
+
+
+def _rebuild_window_worker(
+    database_path: str,
+    animal_type: AnimalType,
+    module_names: list[str],
+    window: tuple[int, int],
+    window_progress: tuple[int, int],
+    verbose: bool = False,
+):
+    """Rebuild one processing window in a worker process. Modules are given
+    by name since module objects cannot be sent to another process."""
+    modules = [importlib.import_module(name) for name in module_names]
+    connection = sqlite3.connect(database_path, timeout=WRITE_TIMEOUT)
+    try:
+        rebuilder = EventsRebuilder(connection, animal_type, verbose=verbose)
+        rebuilder._rebuild_window(
+            modules,
+            window,
+            window_progress=window_progress,
+            commit_each_module=True,
+        )
+    finally:
+        connection.close()
@@ -7,7 +7,6 @@
 
 import json
 from pathlib import Path
-from tkinter import filedialog
 from typing import Any
 
 
@@ -79,6 +78,8 @@ class ParameterSaver(object):
             print(f"No default json found at {load_path}")
 
     def ask_save_name(self, open_dir: Path | None = None) -> Path:
+        from tkinter import filedialog
+
         file_path = Path(
             filedialog.asksaveasfilename(
                 title="Select JSON file",
@@ -91,6 +92,7 @@ class ParameterSaver(object):
     def ask_load_name(self, open_dir: Path | None = None) -> Path:
         """Open a file dialog to select a json file to load. It will start in
         the given directory."""
+        from tkinter import filedialog
 
         file_path = Path(
             filedialog.askopenfilename(
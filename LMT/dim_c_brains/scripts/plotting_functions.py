@@ -2,7 +2,9 @@
 @author: xmousset
 """
 
+import math
 import re
+from functools import lru_cache
 from typing import Any, List
 
 import numpy as np
@@ -11,6 +13,9 @@ from pandas import DataFrame
 from plotly.colors import qualitative
 from plotly import graph_objects as go
 
+WEBGL_MIN_POINTS = 5000
+"""Number of rows from which `line_with_shade` draws with WebGL."""
+
 
 def str_h_min(total_minutes: int | float):
     """
@@ -25,15 +30,20 @@ def str_h_min(total_minutes: int | float):
         "02:15"
     """
 
-    hours = int(total_minutes // 60)
-    minutes = int(total_minutes % 60)
+    return _str_h_min(math.floor(total_minutes))
+
+
+@lru_cache(maxsize=1440)
+def _str_h_min(total_minutes: int) -> str:
+    """Cached "HH:MM" string of a whole number of minutes."""
+    hours, minutes = divmod(total_minutes, 60)
     return f"{hours:02d}:{minutes:02d}"
 
 
 def floor_power10(x: float | int) -> float:
     """Rounds the input number down to the largest multiple of a power of ten
-    less than or equal to x.
-    if x <= 0, return 1.
+    less than or equal to x (in absolute value if x < 0).
+    0, NaN and infinite values are returned unchanged.
 
     Examples:
         >>> print(floor_power10(3756))
@@ -41,25 +51,74 @@ def floor_power10(x: float | int) -> float:
         >>> print(floor_power10(89))
         80
     """
-    if isinstance(x, int):
-        x = float(x)
-
-    if x == 0:
-        floored_value = float(0)
-    elif x >= 1:
-        ten_power = 10 ** (len(str(int(x))) - 1)
-        floored_value: float = (x // ten_power) * ten_power
-    elif x > 0:
-        _, decimals = str(x).split(".")
-        i = 0
-        while i + 1 < len(decimals) and decimals[i] == "0":
-            i += 1
-        ten_power = 10 ** (-(i + 1))
-        floored_value: float = (x // ten_power) * ten_power
-    else:
-        floored_value = -floor_power10(-x)
+    x = float(x)
+
+    if x == 0 or not math.isfinite(x):
+        return x
+    if x < 0:
+        return -floor_power10(-x)
+
+    ten_power = 10.0 ** math.floor(math.log10(x))
+    # log10 may round up just below a power of ten
+    if ten_power > x:
+        ten_power /= 10
+    return (x // ten_power) * ten_power
+
+
+def get_nights(
+    night_begin: tuple[int, int],
+    night_duration: tuple[int, int],
+    start_time: pd.Timestamp,
+    end_time: pd.Timestamp,
+) -> list[tuple[pd.Timestamp, pd.Timestamp]]:
+    """
+    Computes the night periods between two times.
 
-    return floored_value
+    Args:
+        night_begin (tuple of int): The beginning of the night (hour, minute).
+        night_duration (tuple of int): Duration of the night (hours, minutes).
+        start_time (pd.Timestamp): The start time of the plot.
+        end_time (pd.Timestamp): The end time of the plot.
+
+    Returns:
+        list of tuple: The (start, end) of each night, clipped to the plot.
+        A night already begun at `start_time` starts at the quarter hour of
+        `start_time`.
+    """
+    begin_offset = pd.Timedelta(hours=night_begin[0], minutes=night_begin[1])
+    delta_h = pd.Timedelta(hours=night_duration[0], minutes=night_duration[1])
+    if delta_h <= pd.Timedelta(0):
+        return []
+
+    # last night beginning before the start, then one night per day
+    first_begin = (start_time - begin_offset).floor("D") + begin_offset
+    nb_nights = (end_time - first_begin) // pd.Timedelta(days=1) + 1
+    begins = first_begin + pd.to_timedelta(np.arange(nb_nights), unit="D")
+    begins = begins[(begins < end_time) & (begins + delta_h > start_time)]
+
+    nights = []
+    for x_start in begins:
+        x_end = min(x_start + delta_h, end_time)
+        if x_start < start_time.floor("1h"):
+            x_start = start_time.floor("15min")
+        nights.append((x_start, x_end))
+    return nights
+
+
+def get_hours(times: pd.Series) -> pd.Series:
+    """
+    Computes the hour of the day of each time, as `times.dt.hour`.
+
+    Args:
+        times (pd.Series): The times (naive datetimes).
+
+    Returns:
+        pd.Series: The hour of the day (int8) named "HOUR", with the index of
+        `times`.
+    """
+    ns = times.to_numpy(dtype="datetime64[ns]").view("i8")
+    hours = ((ns // 3_600_000_000_000) % 24).astype(np.int8)
+    return pd.Series(hours, index=times.index, name="HOUR")
 
 
 def draw_nights(
@@ -68,6 +127,7 @@ def draw_nights(
     night_duration: tuple[int, int],
     start_time: pd.Timestamp | None = None,
     end_time: pd.Timestamp | None = None,
+    nights: list[tuple[pd.Timestamp, pd.Timestamp]] | None = None,
 ):
     """
     Adds shaded rectangles to a Plotly figure to indicate night periods.
@@ -78,88 +138,136 @@ def draw_nights(
         end_time (pd.Timestamp): The end time of the plot.
         night_begin (tuple of int): The beginning of the night (hour, minute).
         night_duration (tuple of int): Duration of the night (hours, minutes).
+        nights (list of tuple, optional): Night periods already computed by
+            `get_nights`, to share them between figures. If given, the other
+            arguments are ignored.
 
     Returns:
         go.Figure: The figure with night periods shaded.
     """
-    # Collect all x values from all traces in fig.data
-    x_values = []
-    for trace in getattr(fig, "data"):
-        if hasattr(trace, "x") and trace.x is not None:
-            x_values.extend(trace.x)
-
-    if not x_values:
-        print("[WARN] draw_nights: No x values found in figure")
+    if nights is None:
+        if night_duration[0] * 60 + night_duration[1] <= 0:
+            return fig
+        if start_time is None or end_time is None:
+            # Collect the x bounds of each trace in fig.data, only the
+            # traces not already in datetime64 are converted
+            x_bounds = []
+            for trace in getattr(fig, "data"):
+                x = getattr(trace, "x", None)
+                if x is None or len(x) == 0:
+                    continue
+                x = np.asarray(x)
+                if x.dtype.kind != "M":
+                    x = pd.to_datetime(x).to_numpy()
+                x_bounds += [np.nanmin(x), np.nanmax(x)]
+
+            if not x_bounds:
+                print("[WARN] draw_nights: No x values found in figure")
+                return fig
+
+            x_values = pd.DatetimeIndex(x_bounds)
+            if start_time is None:
+                start_time = x_values.min()
+            if end_time is None:
+                end_time = x_values.max()
+
+        nights = get_nights(night_begin, night_duration, start_time, end_time)
+    if not nights:
         return fig
 
-    # Convert to pandas Timestamps if needed
-    if not isinstance(x_values[0], pd.Timestamp):
-        x_values = pd.to_datetime(x_values)
-    if start_time is None:
-        start_time = min(x_values)
-    if end_time is None:
-        end_time = max(x_values)
-
-    h = start_time.floor("1h")
-    start_h = h.replace(hour=night_begin[0], minute=night_begin[1])
-    if start_time.hour < night_begin[0] or (
-        start_time.hour == night_begin[0]
-        and start_time.minute < night_begin[1]
-    ):
-        start_h = start_h - pd.Timedelta(days=1)
-    delta_h = pd.Timedelta(hours=night_duration[0], minutes=night_duration[1])
-    first_night = True
-    while h < end_time:
-
-        if h.hour == night_begin[0] and h.minute == night_begin[1]:
-            x_start = h
-            x_end = h + delta_h
-            if x_end > end_time:
-                x_end = end_time
-            fig.add_vrect(
-                x0=x_start,
-                x1=x_end,
-                line_width=0,
-                fillcolor="black",
-                layer="below",
-                opacity=0.1,
-            )
-            h += delta_h
-
-        elif first_night and h > start_h and h < start_h + delta_h:
-            first_night = False
-            x_start = start_time.floor("15min")
-            x_end = start_h + delta_h
-            if x_end > end_time:
-                x_end = end_time
-            fig.add_vrect(
-                x0=x_start,
-                x1=x_end,
-                line_width=0,
-                fillcolor="black",
-                layer="below",
-                opacity=0.1,
-            )
-
-        else:
-            h += pd.Timedelta(hours=1)
+    # same shapes as `fig.add_vrect`, validated once for all the nights
+    shapes = [
+        dict(
+            type="rect",
+            xref="x",
+            yref="y domain",
+            x0=x_start,
+            x1=x_end,
+            y0=0,
+            y1=1,
+            line_width=0,
+            fillcolor="black",
+            layer="below",
+            opacity=0.1,
+        )
+        for x_start, x_end in nights
+    ]
+    fig.update_layout(shapes=fig.layout.shapes + tuple(shapes))
 
     return fig
 
 
 def hex_to_rgba(hex_color: str, alpha: float = 0.2):
-    hex_color = hex_color.lstrip("#")
-    r, g, b = tuple(int(hex_color[i : i + 2], 16) for i in (0, 2, 4))
+    r, g, b = bytes.fromhex(hex_color.lstrip("#"))
     return f"rgba({r},{g},{b},{alpha})"
 
 
+@lru_cache(maxsize=32)
+def _transparent_colors(color_sequence: tuple[str, ...], alpha: float):
+    """Cached conversion of a color sequence, the same (small) sequences
+    being used by every figure."""
+    # all the colors are decoded in a single call, 3 bytes per color
+    rgb = bytes.fromhex("".join(c.lstrip("#") for c in color_sequence))
+    return tuple(
+        f"rgba({r},{g},{b},{alpha})"
+        for r, g, b in zip(rgb[0::3], rgb[1::3], rgb[2::3])
+    )
+
+
 def get_transparent_color_sequence(
     color_sequence: List[str], alpha: float = 0.2
 ):
-    rgba_colors = [hex_to_rgba(c, alpha) for c in color_sequence]
+    rgba_colors = list(_transparent_colors(tuple(color_sequence), alpha))
     return rgba_colors
 
 
+def _fillna_array(series: pd.Series) -> np.ndarray:
+    """Values of the series with NaN values replaced by 0."""
+    array = series.to_numpy()
+    if array.dtype.kind == "f":
+        return np.where(np.isnan(array), 0.0, array)
+    return series.fillna(0).to_numpy()
+
+
+def _lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """Indices of the `n_out` points kept by the largest-triangle-three-
+    buckets downsampling of the (x, y) curve (first and last points are
+    always kept). All the indices are returned if the curve is not longer
+    than `n_out`."""
+    n = len(y)
+    if n <= n_out or n_out < 3:
+        return np.arange(n)
+
+    if x.dtype.kind == "M":
+        x = x.view("i8")
+    if x.dtype.kind in "iuf":
+        x = x.astype(np.float64) - x[0]
+    else:
+        x = np.arange(n, dtype=np.float64)
+    y = y.astype(np.float64)
+
+    # n - 2 points split in n_out - 2 buckets, one point kept per bucket
+    edges = (np.arange(n_out - 1) * ((n - 2) / (n_out - 2))).astype(int) + 1
+    edges[-1] = n - 1
+    indices = np.empty(n_out, dtype=np.intp)
+    indices[0] = 0
+    indices[-1] = n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        # third vertex: mean of the next bucket (last point for the last one)
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+        areas = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(np.argmax(areas))
+        indices[i + 1] = a
+    return indices
+
+
 def line_with_shade(
     df: DataFrame,
     x_col: str,
@@ -169,6 +277,8 @@ def line_with_shade(
     y_max_col: str | None = None,
     color: str | None = None,
     color_discrete_sequence: list[str] | None = None,
+    use_webgl: bool | None = None,
+    max_points: int | None = 10_000,
     **kwargs: Any,
 ):
     """
@@ -195,6 +305,15 @@ def line_with_shade(
         Required if y_std_col is not provided.
     color_discrete_sequence : list of str or None, optional
         List of colors to use for the lines. If None, a default color sequence is used.
+    use_webgl : bool or None, optional
+        Whether to draw the traces with WebGL (`go.Scattergl`), which stays
+        responsive with many points but has a less detailed hover. If None,
+        WebGL is used when `df` has more than `WEBGL_MIN_POINTS` rows.
+    max_points : int or None, optional
+        Maximum number of points of each line. Longer lines are downsampled
+        (largest-triangle-three-buckets on the line, the same points being
+        kept for the shaded area). If None, all the points are drawn.
+        Defaults to 10 000.
     Returns
     -------
     fig : plotly.graph_objs.Figure
@@ -215,19 +334,25 @@ def line_with_shade(
     else:
         use_std = False
 
+    if use_webgl is None:
+        use_webgl = len(df) > WEBGL_MIN_POINTS
+    scatter = go.Scattergl if use_webgl else go.Scatter
+
     if color_discrete_sequence is None:
         color_sequence = qualitative.Plotly
     else:
         color_sequence = color_discrete_sequence
-    transparent_sequence = get_transparent_color_sequence(color_sequence)
 
-    df_copy = df.copy()
-    # Fill NaN values with 0 for relevant columns (avoid RFID column)
-    for col in [x_col, y_col, y_std_col, y_min_col, y_max_col]:
-        if isinstance(col, str) and col in df_copy.columns:
-            df_copy[col] = df_copy[col].fillna(0)
+    # arrays of the plotted columns, NaN values filled with 0 (the dataframe
+    # is not copied)
+    values = {
+        col: _fillna_array(df[col])
+        for col in [x_col, y_col, y_std_col, y_min_col, y_max_col]
+        if isinstance(col, str) and col in df.columns
+    }
 
-    fig = go.Figure()
+    # traces of all the groups, added to the figure at once
+    traces = []
 
     # Determine unique groups and number of colors to plot
     n_clr = 1
@@ -239,30 +364,45 @@ def line_with_shade(
                 unique_colors = cat_orders[color]
 
         if unique_colors is None:
-            unique_colors = df_copy[color].unique()
+            unique_colors = df[color].unique()
 
         n_clr = len(unique_colors)
+        # row positions of each group found in a single pass
+        groups = df.groupby(color, sort=False, observed=True).indices
+
+    # only the colors of the plotted groups are made transparent
+    transparent_sequence = get_transparent_color_sequence(
+        list(color_sequence[:n_clr])
+    )
 
     for i in range(n_clr):
         if unique_colors is None:
-            sub_df = df_copy
+            rows = slice(None)
             legend_name = y_col
         else:
-            sub_df = df_copy[df_copy[color] == unique_colors[i]]
+            rows = groups.get(unique_colors[i], np.empty(0, dtype=np.intp))
             legend_name = str(unique_colors[i])
 
+        x_values = values[x_col][rows]
+        y_values = values[y_col][rows]
         if use_std:
-            std_up = sub_df[y_col] + sub_df[y_std_col]
-            std_down = sub_df[y_col] - sub_df[y_std_col]
+            y_std = values[y_std_col][rows]
+            std_up = y_values + y_std
+            std_down = y_values - y_std
         else:
-            std_up = sub_df[y_max_col]
-            std_down = sub_df[y_min_col]
-
-        # standard deviation area
-        fig.add_trace(
-            go.Scatter(
-                x=list(sub_df[x_col]) + list(sub_df[x_col])[::-1],
-                y=list(std_up) + list(std_down)[::-1],
+            std_up = values[y_max_col][rows]
+            std_down = values[y_min_col][rows]
+
+        if max_points is not None and len(y_values) > max_points:
+            kept = _lttb_indices(x_values, y_values, max_points)
+            x_values, y_values = x_values[kept], y_values[kept]
+            std_up, std_down = std_up[kept], std_down[kept]
+
+        # standard deviation area (up then reversed down, as a closed shape)
+        traces.append(
+            scatter(
+                x=np.concatenate([x_values, x_values[::-1]]),
+                y=np.concatenate([std_up, std_down[::-1]]),
                 fill="toself",
                 fillcolor=transparent_sequence[i % len(transparent_sequence)],
                 line=dict(color="rgba(255,255,255,0)"),  # no border
@@ -273,16 +413,156 @@ def line_with_shade(
         )
 
         # line trace
-        fig.add_trace(
-            go.Scatter(
-                x=sub_df[x_col],
-                y=sub_df[y_col],
+        traces.append(
+            scatter(
+                x=x_values,
+                y=y_values,
                 mode="lines",
                 name=legend_name,
                 line=dict(color=color_sequence[i % len(color_sequence)]),
             )
         )
 
+    fig = go.Figure(data=traces)
     fig.update_layout(xaxis_title=x_col, yaxis_title=y_col)
 
     return fig
+
+
+def grouped_figure(
+    df: DataFrame,
+    x: str,
+    y: str,
+    color: str,
+    category_orders: dict[str, list] | None = None,
+    kind: str = "bar",
+    title: str | None = None,
+    labels: dict[str, str] | None = None,
+    color_discrete_sequence: list[str] | None = None,
+):
+    """
+    Build a bar, line or scatter figure with one trace per `color` group,
+    looking like its `plotly.express` counterpart.
+
+    The dataframe is split with a single groupby and the traces are built
+    directly from the numpy arrays of each group, which avoids the internal
+    dataframe rebuild and per-trace regrouping of `plotly.express`.
+
+    Parameters
+    ----------
+    df : DataFrame
+        Input data containing the x, y and color columns.
+    x : str
+        Name of the column to use for the x-axis.
+    y : str
+        Name of the column to use for the y-axis.
+    color : str
+        Name of the column to group and color the traces.
+    category_orders : dict or None, optional
+        Order of the groups, as in `plotly.express` (e.g. *{"RFID": ["001",
+        "002"]}*). Groups are in order of appearance otherwise.
+    kind : str, optional
+        "bar", "line" or "scatter". Default is "bar".
+    title : str or None, optional
+        Title of the figure.
+    labels : dict or None, optional
+        Displayed names of the columns, as in `plotly.express`.
+    color_discrete_sequence : list of str or None, optional
+        List of colors to use for the traces. If None, a default color
+        sequence is used.
+    Returns
+    -------
+    fig : plotly.graph_objs.Figure
+        Plotly figure object with one trace per group.
+    """
+    if kind not in ("bar", "line", "scatter"):
+        raise ValueError("kind must be 'bar', 'line' or 'scatter'")
+
+    if category_orders is None:
+        category_orders = {}
+    if labels is None:
+        labels = {}
+    if color_discrete_sequence is None:
+        color_discrete_sequence = qualitative.Plotly
+
+    groups = {
+        key: (sub_df[x].to_numpy(), sub_df[y].to_numpy())
+        for key, sub_df in df[[x, y]].groupby(
+            df[color], observed=True, sort=False
+        )
+    }
+    order = [key for key in category_orders.get(color, []) if key in groups]
+    order += [key for key in groups if key not in order]
+
+    x_label = labels.get(x, x)
+    y_label = labels.get(y, y)
+    color_label = labels.get(color, color)
+
+    traces = []
+    for i, key in enumerate(order):
+        x_values, y_values = groups[key]
+        trace_color = color_discrete_sequence[i % len(color_discrete_sequence)]
+        trace_param = dict(
+            x=x_values,
+            y=y_values,
+            name=str(key),
+            legendgroup=str(key),
+            showlegend=True,
+            orientation="v",
+            xaxis="x",
+            yaxis="y",
+            hovertemplate=(
+                ("" if color == x else f"{color_label}={key}<br>")
+                + f"{x_label}=%{{x}}<br>{y_label}=%{{y}}<extra></extra>"
+            ),
+        )
+        if kind == "bar":
+            traces.append(
+                go.Bar(
+                    marker=dict(color=trace_color, pattern_shape=""),
+                    textposition="auto",
+                    **trace_param,
+                )
+            )
+        elif kind == "line":
+            traces.append(
+                go.Scatter(
+                    mode="lines",
+                    line=dict(color=trace_color, dash="solid"),
+                    marker=dict(symbol="circle"),
+                    **trace_param,
+                )
+            )
+        else:
+            traces.append(
+                go.Scatter(
+                    mode="markers",
+                    marker=dict(color=trace_color, symbol="circle"),
+                    **trace_param,
+                )
+            )
+
+    fig = go.Figure(data=traces)
+    fig.update_layout(
+        xaxis=dict(anchor="y", domain=[0.0, 1.0], title_text=x_label),
+        yaxis=dict(anchor="x", domain=[0.0, 1.0], title_text=y_label),
+        legend=dict(title_text=color_label, tracegroupgap=0),
+    )
+    if title is not None:
+        fig.update_layout(title_text=title)
+    else:
+        fig.update_layout(margin=dict(t=60))
+    if kind == "bar":
+        fig.update_layout(barmode="relative")
+    for axis, col in (("xaxis", x), ("yaxis", y)):
+        if col in category_orders:
+            fig.update_layout(
+                {
+                    axis: dict(
+                        categoryorder="array",
+                        categoryarray=category_orders[col],
+                    )
+                }
+            )
+
+    return fig
@@ -2,18 +2,24 @@
 @author: xmousset
 """
 
-import os
-import sys
-import webbrowser
+import tempfile
 from pathlib import Path
 from typing import Literal
 
 import pandas as pd
 import plotly.graph_objects as go
+from plotly.offline import get_plotlyjs_version
 
 from dim_c_brains.res.report.Report import Report
 from dim_c_brains.res.report.WebSite import WebSite
 
+PLOTLYJS_CDN_URL = (
+    f"https://cdn.plot.ly/plotly-{get_plotlyjs_version()}.min.js"
+)
+"""plotly.js script of the first figure of each page. Same script as
+`include_plotlyjs="cdn"`, which reads and hashes the whole bundled plotly.js
+(~4 MB) at each `to_html` call to write its integrity attribute."""
+
 
 class HTMLReportManager:
     """
@@ -40,6 +46,8 @@ class HTMLReportManager:
         if not (output_folder / "index.html").exists():
             print("HTMLReportManager did not find index.html.")
         else:
+            import webbrowser
+
             webbrowser.open(str(output_folder / "index.html"))
 
     def __init__(self):
@@ -48,10 +56,26 @@ class HTMLReportManager:
         self.exp_name = "main"
         self.html_param = {
             "full_html": False,
-            "include_plotlyjs": "cdn",
+            "include_plotlyjs": PLOTLYJS_CDN_URL,
             "config": {"displaylogo": False},
         }
         self.dimcbrains_path = Path(__file__).parent.parent
+        self._plotlyjs_pages: set[str] = set()
+        """Pages (experiment names) whose plotly.js script is already in the
+        HTML of one of their figures."""
+        self._temp_folder: tempfile.TemporaryDirectory | None = None
+        """Temporary folder of the complete tables and of the figures HTML,
+        written to disk until the output is generated."""
+
+    def _figure_html(self, figure: go.Figure) -> str:
+        """HTML of a figure of the focused page. Only the first figure of the
+        page loads plotly.js, the next ones (rendered after it, in the order
+        the reports are added) use it."""
+        html_param = self.html_param
+        if self.exp_name in self._plotlyjs_pages:
+            html_param = {**html_param, "include_plotlyjs": False}
+        self._plotlyjs_pages.add(self.exp_name)
+        return figure.to_html(**html_param)
 
     def reports_creation_focus(self, exp_name: str = "main"):
         """Define where the new reports will be added. The main page is
@@ -85,17 +109,21 @@ class HTMLReportManager:
                 containing data related to the report, which can be made
                 available for download.
         """
-        html = ""
+        parts = []
         if top_note is not None:
-            html += top_note + "<hr>"
+            parts += [top_note, "<hr>"]
 
         if html_or_figure is not None:
             if isinstance(html_or_figure, go.Figure):
-                html += html_or_figure.to_html(**self.html_param)
+                parts.append(self._figure_html(html_or_figure))
             else:
-                html += html_or_figure
+                parts.append(html_or_figure)
 
-        report = Report(name, html, experimentName=self.exp_name)
+        report = Report(
+            name,
+            self._store_html(parts),
+            experimentName=self.exp_name,
+        )
 
         if graph_datas is not None:
             report.setDownloadableContent("Download data", graph_datas)
@@ -131,12 +159,10 @@ class HTMLReportManager:
         fig_htmls = []
         for fig in figures:
             if isinstance(fig, go.Figure):
-                fig_htmls.append(fig.to_html(**self.html_param))
+                fig_htmls.append(self._figure_html(fig))
             else:
                 fig_htmls.append(fig)
 
-        html = ""
-
         if nb_fig == 0:
             return
 
@@ -147,22 +173,25 @@ class HTMLReportManager:
             cols = min(max_fig_in_row, nb_fig)
             rows = (nb_fig + cols - 1) // cols
 
+        parts = []
         if top_note is not None:
-            html += top_note + "<hr>"
+            parts += [top_note, "<hr>"]
 
-        html += "<div class='container-fluid'>"
+        # same bootstrap column for all the figures
+        col_open = f"<div class='col-{12 // cols}'>"
+        parts.append("<div class='container-fluid'>")
         for j in range(rows):
-            html += "<div class='row'>"
-            for i in range(cols):
-                idx = j * cols + i
-                if idx < nb_fig:
-                    html += f"<div class='col-{12 // cols}'>"
-                    html += fig_htmls[idx]
-                    html += "</div>"
-            html += "</div>"
-        html += "</div>"
-
-        report = Report(name, html, experimentName=self.exp_name)
+            parts.append("<div class='row'>")
+            for fig_html in fig_htmls[j * cols : (j + 1) * cols]:
+                parts += [col_open, fig_html, "</div>"]
+            parts.append("</div>")
+        parts.append("</div>")
+
+        report = Report(
+            name,
+            self._store_html(parts),
+            experimentName=self.exp_name,
+        )
 
         if graph_datas is not None:
             report.setDownloadableContent("Download data", graph_datas)
@@ -193,15 +222,11 @@ class HTMLReportManager:
     ):
         """Add a card block as a report."""
         card_title = (
-            "<div style='text-align: center;'>"
-            "<strong>"
-            "<span style='color: black;'>"
-            f"{name}"
-            "</strong>"
-            "</span>"
-            "</div>"
+            "<div style='text-align: center;'><strong>"
+            f"<span style='color: black;'>{name}</span>"
+            "</strong></div>"
         )
-        card_content = f"<span style='color: black;'>" f"{content}" "</span>"
+        card_content = f"<span style='color: black;'>{content}</span>"
         report = Report(
             card_title,
             card_content,
@@ -222,6 +247,30 @@ class HTMLReportManager:
         report.setDownloadableContent("Download data", df)
         self.reports.append(report)
 
+    def _get_temp_path(self, suffix: str) -> Path:
+        """Path of a temporary file for the next report."""
+        if self._temp_folder is None:
+            self._temp_folder = tempfile.TemporaryDirectory(prefix="lmt_")
+        return Path(self._temp_folder.name) / f"{len(self.reports)}{suffix}"
+
+    def _store_table(self, df: pd.DataFrame) -> Path:
+        """Write a DataFrame to a temporary file and return its path, so that
+        large tables are not kept in memory until the output is generated."""
+        path = self._get_temp_path(".pkl")
+        df.to_pickle(path)
+        return path
+
+    def _store_html(self, parts: list[str]) -> Path:
+        """Write the HTML parts of a report to a temporary file and return its
+        path, so that the figures are not kept in memory until the output is
+        generated (the HTML of a figure embeds all its data). The parts are
+        written one after the other, without joining them in a single
+        string."""
+        path = self._get_temp_path(".html")
+        with path.open("w", encoding="utf-8") as file:
+            file.writelines(parts)
+        return path
+
     def add_table_headers(
         self,
         name: str,
@@ -258,7 +307,7 @@ class HTMLReportManager:
             html,
             experimentName=self.exp_name,
         )
-        report.setDownloadableContent("Download data", df)
+        report.setDownloadableContent("Download data", self._store_table(df))
         self.reports.append(report)
 
     def generate_local_output(
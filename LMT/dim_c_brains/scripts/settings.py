@@ -7,6 +7,7 @@ from typing import Any
 from pathlib import Path
 
 import pandas as pd
+from plotly.colors import qualitative
 
 from dim_c_brains.scripts.parameter_saver import ParameterSaver
 from lmtanalysis.Animal import AnimalType
@@ -171,8 +172,11 @@ class GenericSettings(ABC):
     def get_plot_parameters(self, df: pd.DataFrame) -> dict[str, Any]:
         """Return Plotly color parameters for report graphs.
 
+        The color sequence is pinned so that every figure of a report maps
+        the categories to the same colors without rebuilding the mapping.
+
         **Generic example**: *{"color": "RFID", "category_orders": {"RFID":
-        ["001", "002", "003"]}}*
+        ["001", "002", "003"]}, "color_discrete_sequence": [...]}*
         """
         if not hasattr(self, "report_color"):
             raise ValueError("Settings missing required attributes.")
@@ -186,6 +190,7 @@ class GenericSettings(ABC):
         return {
             "color": comparator,
             "category_orders": {comparator: sorted(df[comparator].unique())},
+            "color_discrete_sequence": qualitative.Plotly,
         }
 
     def get_xlsx_parameters(self, df: pd.DataFrame) -> list[str]:
@@ -1,10 +1,13 @@
-import tkinter as tk
-from tkinter import filedialog
-
 from pathlib import Path
 
+# tkinter is only imported when a dialog is opened, so that the analysis
+# scripts importing this module do not load it (nor need it installed)
+
 
 def select_sqlite_file():
+    import tkinter as tk
+    from tkinter import filedialog
+
     root = tk.Tk()
     root.withdraw()
     file_str = filedialog.askopenfilename(
@@ -19,6 +22,9 @@ def select_sqlite_file():
 
 
 def select_folder():
+    import tkinter as tk
+    from tkinter import filedialog
+
     root = tk.Tk()
     root.withdraw()
     dir_str = filedialog.askdirectory(title="Select Folder")
@@ -59,19 +59,28 @@ def reBuildEvent( connection, file, tmin=None, tmax=None, pool = None, animalTyp
         animalA = pool.animalDictionary[animal]
         #print ( animalA )
         dicA = animalA.detectionDictionary
-            
-        for t in dicA.keys():
 
-            if (dicA[t].isInZone(xa=168, xb=343, ya=296, yb=120) == True):
-                resultCenter[t] = True
-                
-            else:
-                resultPeriphery[t] = True
-                
-        centerZoneTimeLine.reBuildWithDictionary( resultCenter )
+        xySoa = getattr( pool, "xy_soa", None )
+        if ( xySoa != None and animal in xySoa ):
+            # same zone test as isInZone, on the detection arrays of the pool
+            frames, massX, massY = xySoa[animal]
+            inZone = ( massX > 168 ) & ( massX < 343 ) & ( massY > 120 ) & ( massY < 296 )
+            centerZoneTimeLine.reBuildWithFrames( frames[inZone] )
+            peripheryZoneTimeLine.reBuildWithFrames( frames[~inZone] )
+
+        else:
+            for t in dicA.keys():
+
+                if (dicA[t].isInZone(xa=168, xb=343, ya=296, yb=120) == True):
+                    resultCenter[t] = True
+
+                else:
+                    resultPeriphery[t] = True
+
+            centerZoneTimeLine.reBuildWithDictionary( resultCenter )
+            peripheryZoneTimeLine.reBuildWithDictionary( resultPeriphery )
+
         centerZoneTimeLine.endRebuildEventTimeLine(connection)
-    
-        peripheryZoneTimeLine.reBuildWithDictionary( resultPeriphery )
         peripheryZoneTimeLine.endRebuildEventTimeLine(connection)
         
     # log process
@@ -609,6 +609,26 @@ class EventTimeLine:
                 start = -1
 
 
+    def reBuildWithFrames(self, frames ):
+        '''
+        Same as reBuildWithDictionary, with the frames of the events given as an array
+        (e.g. np.flatnonzero of a mask): consecutive frames are grouped with numpy
+        instead of a loop over a dictionary.
+        '''
+        self.eventList.clear()
+
+        frames = np.unique( np.asarray( frames, dtype=np.int64 ) )
+        if ( len( frames ) == 0 ):
+            return
+
+        # an event ends where the next frame is not consecutive
+        breaks = np.flatnonzero( np.diff( frames ) != 1 )
+        starts = frames[ np.concatenate( ( [0], breaks + 1 ) ) ].tolist()
+        ends = frames[ np.concatenate( ( breaks, [len( frames ) - 1] ) ) ].tolist()
+
+        for start, end in zip( starts, ends ):
+            self.eventList.append( Event( start, end ) )
+
     def checkEventHole( self, frameNumber ):
         '''
         Checks if an event end at a givenFrame, and if another one starts just after. Merge event if found.